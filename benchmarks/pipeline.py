@@ -0,0 +1,310 @@
+"""Benchmark the transcription pipeline stage by stage on synthetic audio, offline and on the CPU.
+
+Speech-like synthetic audio is generated from a fixed seed: harmonic tone bursts with a syllable
+envelope, separated by pauses over a faint noise floor. The local ffmpeg encodes it to every
+requested length and format. Each stage is then timed on it:
+
+    decode      ffmpeg pipe decode to 16 kHz float32 (``_decode_audio``, no cache), per format
+    mel         whole-file log-mel spectrogram (``_log_mel_spectrogram``)
+    vad         voice activity regions (``SpeechDetector``)
+    transcribe  the full chunk loop (``transcribe_file``) per model, on already decoded audio
+
+Every stage reports the best wall time of ``--repeat`` runs, the peak RSS, and either throughput
+(seconds of audio per second) or the real-time factor. Nothing is downloaded. Whisper model
+names that are not in the local cache are skipped, and checkpoint paths work as well. Engine
+options such as ``--batch-size``, ``--workers``, ``--vad`` or ``--quantize`` are passed through
+to the transcribe stage.
+
+    python benchmarks/pipeline.py --minutes 1 10 --audio-formats wav flac mp3 --models tiny base --json base.json
+    python benchmarks/pipeline.py --minutes 1 10 --models tiny --json new.json --baseline base.json --threshold 0.1
+
+With ``--baseline``, every metric is compared with the earlier run. The script exits with
+status 1 if any wall time or peak RSS got worse by more than the threshold.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+# Metrics compared against a baseline (lower is better for all of them) and the absolute change
+# below which a difference is treated as timer or allocator noise
+COMPARED_METRICS = {'wall_s': 0.005, 'peak_rss_mb': 5.0}
+
+
+class PeakRss:
+    """Samples the process RSS on a background thread while the ``with`` block runs."""
+
+    def __init__(self, interval: float = 0.005):
+        import psutil
+        self._process = psutil.Process(os.getpid())
+        self._interval = interval
+        self._done = threading.Event()
+        self.start_mb = self.peak_mb = 0.0
+
+    def _rss_mb(self) -> float:
+        return self._process.memory_info().rss / 1024 / 1024
+
+    def _sample(self):
+        while not self._done.wait(self._interval):
+            self.peak_mb = max(self.peak_mb, self._rss_mb())
+
+    def __enter__(self):
+        self.start_mb = self.peak_mb = self._rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, self._rss_mb())
+
+
+def measure(run, repeat: int) -> dict:
+    """Best wall time of ``repeat`` calls to ``run`` and the highest RSS seen during any of them."""
+    best, peak, growth, value = None, 0.0, 0.0, None
+    for _ in range(repeat):
+        gc.collect()
+        with PeakRss() as rss:
+            started = time.perf_counter()
+            value = run()
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        peak = max(peak, rss.peak_mb)
+        growth = max(growth, rss.peak_mb - rss.start_mb)
+    return {'wall_s': best, 'peak_rss_mb': peak, 'rss_growth_mb': growth, 'value': value}
+
+
+def synthetic_speech(seconds: float, seed: int, sample_rate: int = 16000, block_seconds: float = 60.0):
+    """Yield float32 blocks of reproducible speech-like audio totalling ``seconds``."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sample_rate)
+    produced = 0
+    pending = np.empty(0, dtype=np.float32)
+    while produced < total:
+        while len(pending) < block_seconds * sample_rate and produced + len(pending) < total:
+            # One utterance: 0.5-4 s of a voiced harmonic tone with ~4 Hz syllables, then a pause;
+            # about one pause in ten is a longer silence
+            n = int(rng.uniform(0.5, 4.0) * sample_rate)
+            t = np.arange(n) / sample_rate
+            f0 = rng.uniform(90, 240) * (1 + 0.05 * np.sin(2 * np.pi * rng.uniform(3, 6) * t))
+            phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+            voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+            envelope = np.clip(np.sin(np.pi * rng.uniform(3, 5) * t), 0, None) ** 2
+            utterance = 0.3 * voice * envelope + 0.01 * rng.standard_normal(n)
+            pause_seconds = rng.uniform(2.0, 8.0) if rng.random() < 0.1 else rng.uniform(0.2, 1.5)
+            pause = 0.003 * rng.standard_normal(int(pause_seconds * sample_rate))
+            pending = np.concatenate((pending, utterance, pause)).astype(np.float32)
+        block = pending[:min(len(pending), total - produced)]
+        pending = pending[len(block):]
+        produced += len(block)
+        yield block
+
+
+def synthetic_file(work_dir: Path, minutes: float, audio_format: str, seed: int, sample_rate: int) -> Path:
+    """Render (once) synthetic audio to ``work_dir`` with ffmpeg as stereo at ``sample_rate``."""
+    from transcriber_engine import SAMPLE_RATE, _ffmpeg_executable
+    path = work_dir / f"synthetic-{minutes:g}m-seed{seed}-{sample_rate}hz.{audio_format}"
+    if path.exists():
+        return path
+    work_dir.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.stem + '.part' + path.suffix)
+    cmd = [_ffmpeg_executable(), '-nostdin', '-hide_banner', '-loglevel', 'error', '-y',
+           '-f', 'f32le', '-ar', str(SAMPLE_RATE), '-ac', '1', '-i', 'pipe:0',
+           '-ar', str(sample_rate), '-ac', '2', str(partial)]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    try:
+        for block in synthetic_speech(minutes * 60, seed):
+            proc.stdin.write(block.tobytes())
+    finally:
+        proc.stdin.close()
+        rc = proc.wait()
+    if rc != 0:
+        raise RuntimeError(f"ffmpeg could not write {audio_format} (exit code {rc})")
+    os.replace(partial, path)
+    return path
+
+
+def environment(torch_module) -> dict:
+    from transcriber_engine import _ffmpeg_executable
+
+    def output(cmd, cwd=None):
+        try:
+            return subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, timeout=30).stdout.strip()
+        except Exception:
+            return None
+    ffmpeg_version = output([_ffmpeg_executable(), '-hide_banner', '-version'])
+    return {
+        'commit': output(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT),
+        'dirty': bool(output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT)),
+        'python': platform.python_version(),
+        'torch': torch_module.__version__,
+        'ffmpeg': ffmpeg_version.splitlines()[0] if ffmpeg_version else None,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch_module.get_num_threads(),
+    }
+
+
+def result_key(row: dict) -> tuple:
+    return row['stage'], row.get('format'), row['minutes'], row.get('model')
+
+
+def compare(baseline: dict, rows: list, threshold: float) -> list:
+    """Print the change of every compared metric; returns the regressions beyond ``threshold``."""
+    old_rows = {result_key(row): row for row in baseline.get('results', [])}
+    regressions = []
+    for row in rows:
+        old = old_rows.get(result_key(row))
+        if old is None:
+            continue
+        label = ' '.join(str(part) for part in result_key(row) if part is not None)
+        for metric, noise in COMPARED_METRICS.items():
+            before, after = old.get(metric), row.get(metric)
+            if not before or after is None:
+                continue
+            change = after / before - 1
+            regressed = change > threshold and after - before > noise
+            print(f"{label:>32}  {metric:<12} {before:10.3f} -> {after:10.3f}  {change * 100:+6.1f}%"
+                  f"{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append({'key': label, 'metric': metric, 'before': before, 'after': after, 'change': change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--minutes', nargs='+', type=float, default=[1.0, 10.0], help='synthetic audio lengths')
+    parser.add_argument('--audio-formats', nargs='+', default=['wav', 'flac', 'mp3'], help='containers to decode')
+    parser.add_argument('--models', nargs='+', default=['tiny'], help='models or checkpoint paths for the transcribe stage')
+    parser.add_argument('--sample-rate', type=int, default=44100, help='sample rate of the synthetic files')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement; the fastest is reported')
+    parser.add_argument('--threads', type=int, default=0, help='torch CPU threads (default: torch decides)')
+    parser.add_argument('--work-dir', type=Path, default=Path(tempfile.gettempdir()) / 'whisper-bench',
+                        help='where synthetic audio is generated and kept between runs')
+    parser.add_argument('--stages', nargs='+', default=['decode', 'mel', 'vad', 'transcribe'],
+                        choices=['decode', 'mel', 'vad', 'transcribe'])
+    parser.add_argument('--json', type=Path, help='write the results to this file')
+    parser.add_argument('--baseline', type=Path, help='results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed relative slowdown (default: 0.10)')
+    # Unknown flags are engine options (--batch-size, --workers, ...); the engine reads them from sys.argv
+    args, _ = parser.parse_known_args()
+
+    import warnings
+    warnings.filterwarnings("ignore", message="FP16 is not supported on CPU; using FP32 instead")
+    warnings.filterwarnings("ignore", message="The given NumPy array is not writable")
+    import torch
+    import transcriber_engine as engine
+
+    # Every run must do the work: no cached transcripts, no journal to resume from (or to fsync
+    # while timing), and audio is decoded by the benchmark itself
+    engine.APP_OPTIONS['transcript_cache_mb'] = 0
+    engine.APP_OPTIONS['resume'] = False
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    repeat = max(1, args.repeat)
+
+    rows = []
+
+    def report(row, summary):
+        rows.append(row)
+        label = ' '.join(str(part) for part in result_key(row) if part is not None)
+        print(f"{label:>32}  {row['wall_s']:8.3f}s  peak {row['peak_rss_mb']:7.0f} MB  {summary}", flush=True)
+
+    for minutes in args.minutes:
+        files = {fmt: synthetic_file(args.work_dir, minutes, fmt, args.seed, args.sample_rate)
+                 for fmt in args.audio_formats}
+        audio_seconds = minutes * 60
+        audio = None
+        for fmt, path in files.items():
+            result = measure(lambda: engine._decode_audio(str(path)), repeat if 'decode' in args.stages else 1)
+            audio = result.pop('value')
+            if 'decode' in args.stages:
+                file_mb = path.stat().st_size / 1024 / 1024
+                report({'stage': 'decode', 'format': fmt, 'minutes': minutes, **result,
+                        'throughput': audio_seconds / result['wall_s'], 'file_mb_per_s': file_mb / result['wall_s']},
+                       f"{audio_seconds / result['wall_s']:7.0f}x realtime  {file_mb / result['wall_s']:6.1f} MB/s")
+        if audio is None:
+            continue
+
+        if 'mel' in args.stages:
+            result = measure(lambda: engine._log_mel_spectrogram(audio, 80, pad_samples=engine.CHUNK_SAMPLES), repeat)
+            result.pop('value')
+            report({'stage': 'mel', 'minutes': minutes, **result, 'throughput': audio_seconds / result['wall_s']},
+                   f"{audio_seconds / result['wall_s']:7.0f}x realtime")
+
+        if 'vad' in args.stages:
+            result = measure(lambda: engine.SpeechDetector().regions(audio), repeat)
+            regions = result.pop('value')
+            speech = sum(end - start for start, end in regions) / engine.SAMPLE_RATE
+            report({'stage': 'vad', 'minutes': minutes, **result, 'throughput': audio_seconds / result['wall_s'],
+                    'speech_fraction': speech / audio_seconds},
+                   f"{audio_seconds / result['wall_s']:7.0f}x realtime  {100 * speech / audio_seconds:.0f}% speech")
+
+        if 'transcribe' in args.stages:
+            for model_name in args.models:
+                if not engine._model_downloaded(model_name):
+                    print(f"Skipping {model_name}: not downloaded (this benchmark never downloads models)",
+                          file=sys.stderr)
+                    continue
+                model = engine._load_whisper_model(model_name, device='cpu', quantize=engine.APP_OPTIONS['quantize'])
+                decoder = None
+                if engine.APP_OPTIONS['workers'] > 0:
+                    decoder = engine.ParallelChunkDecoder(model_name, engine.APP_OPTIONS['workers'],
+                                                          engine.APP_OPTIONS['quantize'])
+                try:
+                    # One untimed pass so one-off allocations and kernel selection are not measured
+                    engine.transcribe_file(model, model_name, str(files[args.audio_formats[0]]), language='en',
+                                           audio=audio[:engine.CHUNK_SAMPLES])
+                    result = measure(lambda: engine.transcribe_file(
+                        model, model_name, str(files[args.audio_formats[0]]), language='en', audio=audio,
+                        parallel_decoder=(lambda name: decoder) if decoder is not None else None), repeat)
+                finally:
+                    if decoder is not None:
+                        decoder.close()
+                transcript = result.pop('value')
+                report({'stage': 'transcribe', 'model': model_name, 'minutes': minutes, **result,
+                        'rtf': result['wall_s'] / audio_seconds, 'segments': len(transcript['segments'])},
+                       f"RTF {result['wall_s'] / audio_seconds:.3f}")
+                del model
+        audio = None
+
+    output = {
+        'environment': environment(torch),
+        'config': {**{key: (str(value) if isinstance(value, Path) else value) for key, value in vars(args).items()
+                      if key not in ('json', 'baseline')},
+                   'engine': {key: engine.APP_OPTIONS[key] for key in
+                              ('batch_size', 'workers', 'vad', 'boundary_chunking', 'pipeline_depth', 'quantize')}},
+        'results': rows,
+    }
+    regressions = []
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+        if baseline.get('config', {}).get('engine') != output['config']['engine']:
+            print("Warning: the baseline was run with different engine options", file=sys.stderr)
+        print(f"\nCompared with {args.baseline} (commit {baseline.get('environment', {}).get('commit')}):")
+        regressions = compare(baseline, rows, args.threshold)
+        output['regressions'] = regressions
+    if args.json:
+        args.json.write_text(json.dumps(output, indent=2), encoding='utf-8')
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.threshold * 100:.0f}%", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Compare int8-quantized against FP32 Whisper inference on the CPU.
+
+For every model size, each audio file is transcribed with both variants. The report shows the
+real-time factor, the int8 speedup, the weight memory, and the word error rate (WER) of both
+variants. WER is measured against reference transcripts when ``--reference`` is given;
+otherwise the FP32 output is the reference and only the int8 delta is reported.
+
+    python benchmarks/quantization.py --models tiny base small talk.mp3 meeting.wav
+    python benchmarks/quantization.py --models small --reference refs/ --json out.json talk.mp3
+
+Reference transcripts are plain text files named after the audio file (``refs/talk.txt``).
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def normalize_words(text: str) -> list:
+    return re.sub(r"[^\w\s']", ' ', text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level Levenshtein distance divided by the reference length."""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def transcribe(model, audio, language):
+    started = time.perf_counter()
+    result = model.transcribe(audio, language=language, fp16=False, temperature=0.0,
+                              condition_on_previous_text=False)
+    return result['text'].strip(), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('audio', nargs='+', help='audio files to transcribe')
+    parser.add_argument('--models', nargs='+', default=['tiny', 'base', 'small'])
+    parser.add_argument('--language', default=None, help='skip language detection, e.g. "en"')
+    parser.add_argument('--reference', type=Path, help='directory of <audio stem>.txt reference transcripts')
+    parser.add_argument('--threads', type=int, default=0, help='torch CPU threads (default: torch decides)')
+    parser.add_argument('--json', type=Path, help='also write the results to this file')
+    args = parser.parse_args()
+
+    import torch
+    import whisper
+    from transcriber_engine import SAMPLE_RATE, _load_whisper_model, _model_nbytes
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    clips = [(Path(path), whisper.load_audio(path)) for path in args.audio]
+    audio_seconds = sum(len(audio) for _, audio in clips) / SAMPLE_RATE
+    references = {}
+    if args.reference:
+        for path, _ in clips:
+            references[path] = (args.reference / f"{path.stem}.txt").read_text(encoding='utf-8')
+
+    rows = []
+    for model_name in args.models:
+        row = {'model': model_name}
+        outputs = {}
+        for variant, quantize in (('fp32', False), ('int8', True)):
+            model = _load_whisper_model(model_name, device='cpu', quantize=quantize)
+            # One untimed pass so one-off allocations and kernel selection are not measured
+            transcribe(model, clips[0][1][:SAMPLE_RATE * 5], args.language or 'en')
+            texts, elapsed = [], 0.0
+            for _, audio in clips:
+                text, seconds = transcribe(model, audio, args.language)
+                texts.append(text)
+                elapsed += seconds
+            outputs[variant] = texts
+            row[f'{variant}_rtf'] = elapsed / audio_seconds
+            row[f'{variant}_mb'] = _model_nbytes(model) / 1024 / 1024
+            del model
+        row['speedup'] = row['fp32_rtf'] / row['int8_rtf']
+        if references:
+            for variant, texts in outputs.items():
+                row[f'{variant}_wer'] = sum(word_error_rate(references[path], text)
+                                            for (path, _), text in zip(clips, texts)) / len(clips)
+            row['wer_delta'] = row['int8_wer'] - row['fp32_wer']
+        else:
+            row['wer_delta'] = sum(word_error_rate(ref, hyp)
+                                   for ref, hyp in zip(outputs['fp32'], outputs['int8'])) / len(clips)
+        rows.append(row)
+        print(f"{model_name:>8}  RTF fp32 {row['fp32_rtf']:.3f}  int8 {row['int8_rtf']:.3f}  "
+              f"speedup {row['speedup']:.2f}x  weights {row['fp32_mb']:.0f} -> {row['int8_mb']:.0f} MB  "
+              f"WER delta {row['wer_delta'] * 100:+.2f} pts", flush=True)
+
+    if args.json:
+        args.json.write_text(json.dumps({'audio_seconds': audio_seconds, 'results': rows}, indent=2), encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()
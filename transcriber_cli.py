@@ -0,0 +1,150 @@
+"""Headless batch transcription (``--batch``): no GTK, and one model load for every file."""
+import sys
+import time
+import logging
+import threading
+from pathlib import Path
+
+from transcriber_engine import (
+    APP_OPTIONS,
+    METRICS,
+    SAMPLE_RATE,
+    STARTUP,
+    ModelRegistry,
+    ParallelChunkDecoder,
+    _audio_files,
+    _prefetch,
+    _safe_load_audio,
+    transcribe_file,
+)
+from transcriber_export import EXPORTERS, OutputNames, TranscriptExport, parse_formats
+
+USAGE = """usage: whisper_transcriber.py --batch [options] FILE_OR_DIR...
+
+Transcripts are written to --output-dir (default: ./transcripts) as they are decoded.
+  --model NAME        Whisper model (default: small)
+  --language CODE     skip language detection, e.g. en
+  --formats LIST      comma-separated, any of: jsonl, srt, vtt (default: jsonl,srt)
+  --workers N         decode chunks in N worker processes
+"""
+
+
+def _collect_inputs(args) -> list:
+    """``(path, relative output stem)`` for every audio file named by ``args``; directories are walked."""
+    inputs = []
+    for arg in args:
+        root = Path(arg)
+        if root.is_dir():
+            for path in _audio_files(root):
+                inputs.append((path, path.relative_to(root).with_suffix('')))
+        elif root.is_file():
+            inputs.append((root, Path(root.stem)))
+        else:
+            print(f"Skipping {arg}: no such file or directory", file=sys.stderr)
+    return inputs
+
+
+def _load_audio(path: Path):
+    try:
+        return _safe_load_audio(str(path))
+    except Exception as e:
+        return e
+
+
+def run_batch(args) -> int:
+    """Transcribe every input with one loaded model; returns the process exit code."""
+    import warnings
+    warnings.filterwarnings("ignore", message="FP16 is not supported on CPU; using FP32 instead")
+    warnings.filterwarnings("ignore", message="The given NumPy array is not writable")
+
+    inputs = _collect_inputs(args)
+    formats, unknown = parse_formats(APP_OPTIONS['formats'])
+    if not inputs or not formats or unknown:
+        if unknown:
+            print(f"Unknown output format: {', '.join(unknown)} (available: {', '.join(EXPORTERS)})", file=sys.stderr)
+        print(USAGE, file=sys.stderr)
+        return 2
+
+    out_dir = Path(APP_OPTIONS['output_dir'] or 'transcripts')
+    names = OutputNames()
+    model_name = APP_OPTIONS['model']
+    models = ModelRegistry(APP_OPTIONS['model_memory_mb'] * 1024 * 1024, quantize=APP_OPTIONS['quantize'])
+    print(f"Loading {model_name} model...", file=sys.stderr)
+    model = models.get(model_name)
+    STARTUP.mark('model loaded')
+
+    decoder = None
+
+    def parallel_decoder(name):
+        nonlocal decoder
+        if decoder is None:
+            decoder = ParallelChunkDecoder(name, APP_OPTIONS['workers'], APP_OPTIONS['quantize'])
+        return decoder
+
+    stop = threading.Event()
+    if APP_OPTIONS['streaming']:
+        source = ((path, stem, None) for path, stem in inputs)
+    else:
+        # The next file is decoded while the current one is being transcribed
+        source = _prefetch(((path, stem, _load_audio(path)) for path, stem in inputs), 1, stop, 'audio-load')
+
+    failures = 0
+    batch_start = time.perf_counter()
+    try:
+        for n, (path, stem, audio) in enumerate(source, 1):
+            prefix = f"[{n}/{len(inputs)}] {path}"
+            if isinstance(audio, Exception):
+                failures += 1
+                METRICS.count('jobs_failed')
+                print(f"{prefix}: failed to decode audio: {audio}", file=sys.stderr)
+                continue
+            # Written as .part files while decoding and renamed once the file is complete
+            export = TranscriptExport(names.target(out_dir / stem, path), formats)
+            started = time.perf_counter()
+            try:
+                result = transcribe_file(
+                    model, model_name, str(path),
+                    language=APP_OPTIONS['language'],
+                    stop_event=stop,
+                    audio=audio,
+                    parallel_decoder=parallel_decoder if APP_OPTIONS['workers'] > 0 else None,
+                    on_status=lambda message: logging.debug('%s: %s', path, message),
+                    on_segments=export.write,
+                    keep_segments=False,
+                )
+            except Exception as e:
+                failures += 1
+                METRICS.count('jobs_failed')
+                logging.exception('Batch transcription of %s failed', path)
+                print(f"{prefix}: failed: {e}", file=sys.stderr)
+                continue
+            finally:
+                export.close()
+            export.finish()
+            elapsed = time.perf_counter() - started
+            if audio is not None:
+                duration = len(audio) / SAMPLE_RATE
+            else:
+                duration = result['metrics']['audio_seconds']
+            print(f"{prefix}: {duration:.0f}s of {result['language']} audio in {elapsed:.1f}s "
+                  f"({result['segment_count']} segments, peak RSS {result['metrics']['peak_rss_mb']:.0f} MB)", flush=True)
+            if n == 1:
+                STARTUP.mark('first file transcribed')
+                STARTUP.report('Startup and first transcription')
+            del audio
+    except KeyboardInterrupt:
+        stop.set()
+        print("Interrupted", file=sys.stderr)
+        return 130
+    finally:
+        stop.set()
+        if hasattr(source, 'close'):
+            source.close()
+        if decoder is not None:
+            decoder.close()
+        logging.info('Model cache: %s', models.summary())
+        models.clear()
+
+    print(f"Transcribed {len(inputs) - failures} of {len(inputs)} files in {time.perf_counter() - batch_start:.1f}s "
+          f"to {out_dir}", file=sys.stderr)
+    return 1 if failures else 0
@@ -0,0 +1,106 @@
+"""Command-line client for the local transcription service (``whisper_transcriber.py --serve PORT``).
+
+Files are sent concurrently, so the service decodes their chunks in shared batches. Segments
+are printed as they arrive; only the standard library is needed.
+
+    python transcriber_client.py --port 8765 talk.mp3 meeting.wav
+    python transcriber_client.py --port 8765 --upload --language en --json talk.mp3
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+from urllib.parse import urlencode
+
+
+def _timestamp(seconds: float) -> str:
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{secs:02}"
+
+
+def _upload_limit(connection) -> int | None:
+    """The service's upload size limit in MB, from ``GET /health``."""
+    connection.request('GET', '/health')
+    response = connection.getresponse()
+    return json.loads(response.read() or b'{}').get('max_upload_mb')
+
+
+def transcribe(port: int, path: str, upload: bool = False, **params):
+    """Yield the service's JSON lines for ``path``: ``{'segments': [...]}``, ``{'status': ...}``, then the final state."""
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    try:
+        if upload:
+            size = os.path.getsize(path)
+            # The service refuses larger uploads without reading them, which shows here only as a broken pipe
+            limit = _upload_limit(connection)
+            if limit is not None and size > limit * 1024 * 1024:
+                yield {'state': 'failed', 'error': f"{size / 1024 / 1024:.1f} MB is over the service's {limit} MB upload limit"}
+                return
+            params['filename'] = os.path.basename(path)
+            with open(path, 'rb') as f:
+                connection.request('POST', '/transcribe?' + urlencode(params), body=f,
+                                   headers={'Content-Length': str(size)})
+        else:
+            params['path'] = os.path.abspath(path)
+            connection.request('POST', '/transcribe?' + urlencode(params))
+        response = connection.getresponse()
+        if response.status != 200:
+            yield {'state': 'failed', 'error': json.loads(response.read() or b'{}').get('error', response.reason)}
+            return
+        for line in response:
+            yield json.loads(line)
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='+', help='audio files to transcribe')
+    parser.add_argument('--port', type=int, required=True, help='port given to --serve')
+    parser.add_argument('--model', help='model to use (default: the one the service was started with)')
+    parser.add_argument('--language', help='skip language detection, e.g. "en"')
+    parser.add_argument('--task', choices=['transcribe', 'translate'], default='transcribe')
+    parser.add_argument('--upload', action='store_true', help='send the audio instead of its path')
+    parser.add_argument('--json', action='store_true', help='print the raw JSON lines')
+    args = parser.parse_args()
+
+    params = {name: value for name, value in (('model', args.model), ('language', args.language), ('task', args.task))
+              if value}
+    output_lock = threading.Lock()
+    failures = []
+
+    def run(path):
+        prefix = f"{path}: " if len(args.files) > 1 else ''
+        try:
+            for message in transcribe(args.port, path, args.upload, **params):
+                with output_lock:
+                    if args.json:
+                        print(json.dumps({'file': path, **message}, ensure_ascii=False), flush=True)
+                    elif 'segments' in message:
+                        for segment in message['segments']:
+                            print(f"{prefix}[{_timestamp(segment['start'])} --> {_timestamp(segment['end'])}] "
+                                  f"{segment['text'].strip()}", flush=True)
+                    elif 'state' in message:
+                        print(f"{prefix}{message['state']}" + (f": {message['error']}" if 'error' in message else ''),
+                              file=sys.stderr)
+                if message.get('state') not in (None, 'done'):
+                    failures.append(path)
+        except (OSError, ValueError) as e:
+            with output_lock:
+                print(f"{prefix}failed: {e}", file=sys.stderr)
+            failures.append(path)
+
+    threads = [threading.Thread(target=run, args=(path,)) for path in args.files]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
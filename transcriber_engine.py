@@ -0,0 +1,2684 @@
+"""Transcription engine: options, audio decoding, caches, models and the chunked decode loop.
+
+Nothing here imports GTK, so the batch CLI and worker processes can use it on headless hosts.
+"""
+import os
+import threading
+import subprocess
+import sys
+import gc
+
+from pathlib import Path
+import logging
+import shutil
+import itertools
+import queue
+import contextlib
+import json
+import sqlite3
+import time
+import weakref
+import bisect
+from datetime import timedelta
+
+# -------------------- Debug / Logging --------------------
+# Command-line options and their defaults. Each key maps to a ``--key-name`` flag; booleans are
+# plain switches, everything else takes ``--key-name value`` or ``--key-name=value``.
+APP_OPTION_DEFAULTS = {
+    'debug': False,
+    'log_file': None,
+    # Pull audio from ffmpeg in 30 s windows instead of decoding the whole file up front
+    'streaming': False,
+    # Size bound (MB) of the on-disk decoded-audio cache; 0 disables it
+    'audio_cache_mb': 2048,
+    # Number of 30 s chunks stacked into one encoder/decoder pass
+    'batch_size': 1,
+    # Worker processes that decode chunks in parallel on the CPU; 0 decodes in-process
+    'workers': 0,
+    # Skip silent stretches with an energy-based voice activity pre-pass
+    'vad': False,
+    # Move each window to the end of the last complete segment and cut at quiet frames
+    'boundary_chunking': False,
+    # Items each pipeline stage (audio decode, mel) may run ahead of inference; 0 runs serially
+    'pipeline_depth': 2,
+    # Size bound (MB) of the on-disk cache of decoded chunk transcripts; 0 disables it
+    'transcript_cache_mb': 64,
+    # Memory (MB) loaded models may occupy together before the least recently used is dropped
+    'model_memory_mb': 4096,
+    # Load the selected model in the background, and the last-used one at startup
+    'warm_up': True,
+    # Run Linear layers with dynamic int8 quantization on the CPU (smaller, faster, slightly less accurate)
+    'quantize': False,
+    # Files the GUI queue transcribes at the same time; they share one loaded model
+    'jobs': 2,
+    # Transcribe the files/directories given on the command line without starting the GUI
+    'batch': False,
+    # Run the local transcription service on http://127.0.0.1:PORT instead of the GUI; 0 disables it
+    'serve': 0,
+    # Largest audio upload (MB) --serve accepts; larger requests are refused with 413
+    'max_upload_mb': 2048,
+    # Model and language used by --batch and --serve; transcripts are written to output_dir
+    # (the GUI exports only when it is set)
+    'model': 'small',
+    'language': None,
+    'output_dir': None,
+    # Comma-separated transcript formats written to output_dir
+    'formats': 'jsonl,srt',
+    # Prometheus textfile rewritten with pipeline metrics every --metrics-interval seconds
+    'metrics_file': None,
+    # Serve the same metrics on http://127.0.0.1:PORT/metrics; 0 disables the endpoint
+    'metrics_port': 0,
+    # Seconds between RSS/CPU samples (and metrics file rewrites)
+    'metrics_interval': 5.0,
+    # Import torch/whisper in the background once the window is up, before the first transcription
+    'preload': True,
+    # Log (and print) startup milestones and import time per package
+    'profile_startup': False,
+    # Continue an interrupted transcription from its journal instead of starting over
+    'resume': True,
+    # Fast model (e.g. tiny) whose draft transcript is shown while the selected model refines it
+    'draft_model': None,
+}
+
+def _parse_args(argv, positional: list | None = None):
+    opts = dict(APP_OPTION_DEFAULTS)
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        i += 1
+        if not arg.startswith('--'):
+            if positional is not None:
+                positional.append(arg)
+            continue
+        name, sep, value = arg[2:].partition('=')
+        key = name.replace('-', '_')
+        if key not in opts:
+            continue
+        default = APP_OPTION_DEFAULTS[key]
+        if isinstance(default, bool):
+            opts[key] = value.lower() not in ('0', 'false', 'no', 'off') if sep else True
+            continue
+        if not sep:
+            if i >= len(argv):
+                continue
+            value = argv[i]
+            i += 1
+        try:
+            opts[key] = value if default is None else type(default)(value)
+        except ValueError:
+            pass
+    return opts
+
+def _app_data_dir(*parts) -> Path:
+    """Per-user data directory (LocalAppData on Windows, home elsewhere)."""
+    return Path(os.getenv('LOCALAPPDATA', Path.home())).joinpath('WhisperTranscriber', *parts)
+
+def _load_settings() -> dict:
+    """Persisted UI settings (last-used model, ...); empty when missing or unreadable."""
+    try:
+        settings = json.loads(_app_data_dir('settings.json').read_text(encoding='utf-8'))
+        return settings if isinstance(settings, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def _save_settings(**changes):
+    path = _app_data_dir('settings.json')
+    settings = _load_settings()
+    settings.update(changes)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(settings, indent=2), encoding='utf-8')
+        os.replace(tmp, path)
+    except OSError as e:
+        logging.debug('Could not save settings: %s', e)
+
+def _ensure_console():
+    if os.name == 'nt':
+        try:
+            import ctypes
+            # Allocate a new console window if not already attached
+            ctypes.windll.kernel32.AllocConsole()
+            # Rebind stdio to the console
+            sys.stdout = open('CONOUT$', 'w', buffering=1, encoding='utf-8', errors='replace')
+            sys.stderr = open('CONOUT$', 'w', buffering=1, encoding='utf-8', errors='replace')
+            try:
+                sys.stdin = open('CONIN$', 'r', encoding='utf-8', errors='replace')
+            except Exception:
+                pass
+        except Exception:
+            pass
+
+def _setup_logging(debug: bool, log_file: str | None):
+    try:
+        handlers = []
+        if debug and os.name == 'nt':
+            _ensure_console()
+        if log_file is None:
+            # Default log location on Windows under LocalAppData; otherwise in home dir
+            base_logs = _app_data_dir('logs')
+            base_logs.mkdir(parents=True, exist_ok=True)
+            log_file = str(base_logs / 'whisper_transcriber.log')
+        fh = logging.FileHandler(log_file, encoding='utf-8')
+        handlers.append(fh)
+        if debug:
+            handlers.append(logging.StreamHandler(sys.stdout))
+        logging.basicConfig(
+            level=logging.DEBUG if debug else logging.INFO,
+            format='%(asctime)s %(levelname)s %(name)s: %(message)s',
+            handlers=handlers,
+        )
+        logging.getLogger(__name__).debug('Logging initialized. debug=%s, file=%s', debug, log_file)
+    except Exception:
+        pass
+
+# Arguments that are not options, e.g. the input files of --batch
+APP_ARGS: list = []
+APP_OPTIONS = _parse_args(sys.argv[1:], APP_ARGS)
+DEBUG_MODE = APP_OPTIONS['debug']
+DEBUG_LOGFILE = APP_OPTIONS['log_file']
+if DEBUG_MODE:
+    # Make GLib verbose and unbuffer Python stdio
+    os.environ.setdefault('G_MESSAGES_DEBUG', 'all')
+    os.environ.setdefault('PYTHONUNBUFFERED', '1')
+_setup_logging(DEBUG_MODE, DEBUG_LOGFILE)
+
+def _install_exception_hook():
+    """Log unhandled exceptions (and show them on Windows) instead of printing them; GUI only, since
+    --batch and --serve need the default traceback on stderr."""
+    def _hook(exc_type, exc_value, exc_traceback):
+        try:
+            logging.exception("Unhandled exception", exc_info=(exc_type, exc_value, exc_traceback))
+        finally:
+            # Also show a message box on Windows if no console
+            if os.name == 'nt' and not DEBUG_MODE:
+                try:
+                    import ctypes, traceback as _tb
+                    msg = ''.join(_tb.format_exception(exc_type, exc_value, exc_traceback))[-1600:]
+                    ctypes.windll.user32.MessageBoxW(None, f"An unexpected error occurred:\n{msg}", "Whisper Transcriber", 0x10)
+                except Exception:
+                    pass
+    sys.excepthook = _hook
+
+# -------------------- Metrics --------------------
+class _JobMeter:
+    def __init__(self, before: dict):
+        self.started = time.perf_counter()
+        self.before = before
+        self.peak_rss = 0
+
+# Upper bounds (seconds) of the per-call stage histograms; a 30 s chunk takes from milliseconds
+# (mel) to tens of seconds (large models on a CPU)
+CHUNK_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class PipelineMetrics:
+    """Process-wide pipeline metrics: stage timings, counters, queue depths and resource samples.
+
+    Stages (``audio_decode``, ``mel``, ``vad``, ``encoder``, ``decoder``) accumulate calls and
+    seconds, and every record also lands in a per-stage histogram of seconds per call, so the
+    distribution of per-chunk encoder/decoder/mel times is kept (batched chunks count as one
+    call each, at the batch's average time). Queues registered with ``watch_queue`` are reported by name. Once ``start`` is
+    called, a sampler thread records the RSS and CPU of this process and its worker processes
+    every ``--metrics-interval`` seconds. When enabled, it also rewrites the ``--metrics-file``
+    Prometheus textfile and serves the same text on ``127.0.0.1:--metrics-port/metrics``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sample_lock = threading.Lock()
+        self._stages = {}  # stage -> [calls, seconds]
+        self._histograms = {}  # stage -> [count per CHUNK_SECONDS_BUCKETS bucket (+Inf last), sum, count]
+        self._counters = {}
+        self._queues = []  # (name, queue)
+        self._resources = {}
+        self._peak_rss = 0
+        # Meters of running jobs, whose peak RSS the sampler keeps up to date; held weakly so a
+        # job that fails before job_finished just drops out
+        self._jobs = weakref.WeakSet()
+        self._sampler = None
+        self._server = None
+        self._process = None  # psutil.Process of this process, created by the first sample
+        self._children = {}  # pid -> psutil.Process of worker processes
+
+    def record(self, stage: str, seconds: float, calls: int = 1):
+        with self._lock:
+            totals = self._stages.setdefault(stage, [0, 0.0])
+            totals[0] += calls
+            totals[1] += seconds
+            if calls:
+                histogram = self._histograms.setdefault(stage, [[0] * (len(CHUNK_SECONDS_BUCKETS) + 1), 0.0, 0])
+                histogram[0][bisect.bisect_left(CHUNK_SECONDS_BUCKETS, seconds / calls)] += calls
+                histogram[1] += seconds
+                histogram[2] += calls
+
+    @contextlib.contextmanager
+    def timer(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def count(self, name: str, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def watch_queue(self, name: str, items):
+        with self._lock:
+            self._queues.append((name, items))
+
+    def unwatch_queue(self, items):
+        with self._lock:
+            self._queues = [(name, q) for name, q in self._queues if q is not items]
+
+    def drain(self) -> dict:
+        """Return and reset stage totals and counters; worker processes ship them to the parent."""
+        with self._lock:
+            drained = {'stages': self._stages, 'histograms': self._histograms, 'counters': self._counters}
+            self._stages, self._histograms, self._counters = {}, {}, {}
+        return drained
+
+    def merge(self, drained: dict):
+        with self._lock:
+            for stage, (calls, seconds) in drained['stages'].items():
+                totals = self._stages.setdefault(stage, [0, 0.0])
+                totals[0] += calls
+                totals[1] += seconds
+            for stage, (buckets, seconds, calls) in drained['histograms'].items():
+                histogram = self._histograms.setdefault(stage, [[0] * (len(CHUNK_SECONDS_BUCKETS) + 1), 0.0, 0])
+                histogram[0] = [mine + theirs for mine, theirs in zip(histogram[0], buckets)]
+                histogram[1] += seconds
+                histogram[2] += calls
+        for name, amount in drained['counters'].items():
+            self.count(name, amount)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            depths = {}
+            for name, items in self._queues:
+                depths[name] = depths.get(name, 0) + items.qsize()
+            return {
+                'stages': {stage: tuple(totals) for stage, totals in self._stages.items()},
+                'histograms': {stage: (list(buckets), seconds, calls)
+                               for stage, (buckets, seconds, calls) in self._histograms.items()},
+                'counters': dict(self._counters),
+                'queues': depths,
+                'resources': dict(self._resources, peak_rss_bytes=self._peak_rss),
+            }
+
+    def start(self):
+        """Start the resource sampler and the configured exporters (idempotent)."""
+        with self._lock:
+            if self._sampler is not None:
+                return
+            self._sampler = threading.Thread(target=self._sample_loop, name='metrics-sampler', daemon=True)
+        self._sample()
+        self._sampler.start()
+        port = APP_OPTIONS['metrics_port']
+        if port:
+            try:
+                self._serve(port)
+            except OSError as e:
+                logging.warning('Metrics endpoint on port %d unavailable: %s', port, e)
+
+    def _sample(self):
+        try:
+            import psutil
+        except ImportError:
+            return
+        with self._sample_lock:
+            self._sample_locked(psutil)
+
+    def _sample_locked(self, psutil):
+        if self._process is None:
+            self._process = psutil.Process(os.getpid())
+            self._process.cpu_percent(None)
+        rss = self._process.memory_info().rss
+        cpu = self._process.cpu_percent(None)
+        worker_rss, worker_cpu = 0, 0.0
+        try:
+            children = self._process.children(recursive=True)
+        except psutil.Error:
+            children = []
+        alive = {}
+        for child in children:
+            # Keep the Process objects so cpu_percent measures since the previous sample
+            child = self._children.get(child.pid, child)
+            try:
+                worker_rss += child.memory_info().rss
+                worker_cpu += child.cpu_percent(None)
+                alive[child.pid] = child
+            except psutil.Error:
+                continue
+        self._children = alive
+        with self._lock:
+            self._resources = {'rss_bytes': rss, 'cpu_percent': cpu,
+                               'worker_rss_bytes': worker_rss, 'worker_cpu_percent': worker_cpu}
+            self._peak_rss = max(self._peak_rss, rss + worker_rss)
+            for job in self._jobs:
+                job.peak_rss = max(job.peak_rss, rss + worker_rss)
+
+    def _sample_loop(self):
+        interval = max(APP_OPTIONS['metrics_interval'], 0.1)
+        while True:
+            time.sleep(interval)
+            try:
+                self._sample()
+                if APP_OPTIONS['metrics_file']:
+                    self.write_textfile(APP_OPTIONS['metrics_file'])
+            except Exception as e:
+                logging.debug('Metrics sample failed: %s', e)
+
+    def prometheus_text(self) -> str:
+        snap = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP whisper_{name} {help_text}")
+            lines.append(f"# TYPE whisper_{name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"whisper_{name}{{{label_text}}} {value}" if label_text else f"whisper_{name} {value}")
+
+        stages = sorted(snap['stages'].items())
+        metric('stage_seconds_total', 'counter', 'Wall time spent in each pipeline stage.',
+               [({'stage': stage}, f"{seconds:.6f}") for stage, (_, seconds) in stages])
+        metric('stage_calls_total', 'counter', 'Calls of each pipeline stage (encoder/decoder: chunks).',
+               [({'stage': stage}, calls) for stage, (calls, _) in stages])
+        lines.append("# HELP whisper_chunk_stage_seconds Seconds per call of each pipeline stage "
+                     "(encoder/decoder: per chunk).")
+        lines.append("# TYPE whisper_chunk_stage_seconds histogram")
+        for stage, (buckets, seconds, calls) in sorted(snap['histograms'].items()):
+            cumulative = 0
+            for bound, n in zip([f'{bound:g}' for bound in CHUNK_SECONDS_BUCKETS] + ['+Inf'], buckets):
+                cumulative += n
+                lines.append(f'whisper_chunk_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'whisper_chunk_stage_seconds_sum{{stage="{stage}"}} {seconds:.6f}')
+            lines.append(f'whisper_chunk_stage_seconds_count{{stage="{stage}"}} {calls}')
+        counters = snap['counters']
+        metric('decoded_tokens_total', 'counter', 'Tokens produced by the decoder.', [({}, counters.get('tokens', 0))])
+        metric('chunks_total', 'counter', 'Audio chunks decoded by the model.', [({}, counters.get('chunks', 0))])
+        metric('audio_seconds_total', 'counter', 'Seconds of audio transcribed.',
+               [({}, f"{counters.get('audio_seconds', 0.0):.3f}")])
+        metric('jobs_total', 'counter', 'Finished transcriptions by outcome.',
+               [({'state': name[len('jobs_'):]}, value) for name, value in sorted(counters.items())
+                if name.startswith('jobs_')])
+        metric('queue_depth', 'gauge', 'Items waiting in each pipeline queue.',
+               [({'queue': name}, depth) for name, depth in sorted(snap['queues'].items())])
+        resources = snap['resources']
+        if 'rss_bytes' in resources:
+            metric('resident_memory_bytes', 'gauge', 'Resident memory of this process and its worker processes.',
+                   [({'process': 'main'}, resources['rss_bytes']), ({'process': 'workers'}, resources['worker_rss_bytes'])])
+            metric('cpu_percent', 'gauge', 'CPU use since the previous sample (100 = one core).',
+                   [({'process': 'main'}, f"{resources['cpu_percent']:.1f}"),
+                    ({'process': 'workers'}, f"{resources['worker_cpu_percent']:.1f}")])
+            metric('peak_resident_memory_bytes', 'gauge', 'Highest sampled resident memory, workers included.',
+                   [({}, resources['peak_rss_bytes'])])
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str):
+        """Atomically rewrite ``path`` for node_exporter's textfile collector."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+    def _serve(self, port: int):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug('metrics endpoint: ' + format, *args)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+        logging.info('Serving metrics on http://127.0.0.1:%d/metrics', self._server.server_address[1])
+
+    def job_started(self) -> '_JobMeter':
+        """Begin per-job (or per-run) accounting; pass the meter to ``job_finished`` or ``summarize``."""
+        self.start()
+        self._sample()
+        job = _JobMeter(self.snapshot())
+        with self._lock:
+            job.peak_rss = self._resources.get('rss_bytes', 0) + self._resources.get('worker_rss_bytes', 0)
+            self._jobs.add(job)
+        return job
+
+    def job_finished(self, job: '_JobMeter', audio_seconds: float, state: str = 'done') -> dict:
+        """Count the finished job, refresh the metrics file, and return its summary."""
+        self.count(f'jobs_{state}')
+        self.count('audio_seconds', audio_seconds)
+        summary = self.summarize(job, audio_seconds)
+        if APP_OPTIONS['metrics_file']:
+            try:
+                self.write_textfile(APP_OPTIONS['metrics_file'])
+            except OSError as e:
+                logging.warning('Could not write metrics file: %s', e)
+        return summary
+
+    def summarize(self, job: '_JobMeter', audio_seconds: float) -> dict:
+        """Wall time, RTF, stage seconds, tokens/s and peak RSS since ``job_started``. Stage totals
+        are process-wide, so when jobs run concurrently they include each other's work."""
+        self._sample()
+        wall_seconds = time.perf_counter() - job.started
+        with self._lock:
+            self._jobs.discard(job)
+        before, after = job.before, self.snapshot()
+        stages = {}
+        for stage, (calls, seconds) in after['stages'].items():
+            old_calls, old_seconds = before['stages'].get(stage, (0, 0.0))
+            if calls > old_calls:
+                stages[stage] = round(seconds - old_seconds, 3)
+        tokens = after['counters'].get('tokens', 0) - before['counters'].get('tokens', 0)
+        decoder_seconds = stages.get('decoder', 0.0)
+        return {
+            'wall_seconds': round(wall_seconds, 3),
+            'audio_seconds': round(audio_seconds, 3),
+            'rtf': round(wall_seconds / audio_seconds, 4) if audio_seconds else None,
+            'stage_seconds': stages,
+            'chunks': after['counters'].get('chunks', 0) - before['counters'].get('chunks', 0),
+            'tokens': tokens,
+            'tokens_per_second': round(tokens / decoder_seconds, 1) if decoder_seconds else None,
+            'peak_rss_mb': round(job.peak_rss / 1024 / 1024, 1),
+        }
+
+METRICS = PipelineMetrics()
+
+class StartupProfile:
+    """Startup milestones and import time per top-level package for ``--profile-startup``.
+
+    ``begin`` sets the origin (the entry script's first timestamp) and, when profiling, wraps
+    ``builtins.__import__`` so each first import is timed. A package's self time excludes the
+    packages it imports in turn. Without ``--profile-startup`` marks are only kept for ``report``.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.enabled = False
+        self._marks = {}
+        self._imports = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def begin(self, origin: float):
+        self.origin = origin
+        self.enabled = APP_OPTIONS['profile_startup']
+        self.mark('engine imported')
+        if self.enabled:
+            self._install_import_hook()
+
+    def mark(self, name: str):
+        """Record the first time ``name`` happens, in seconds since the origin."""
+        with self._lock:
+            self._marks.setdefault(name, time.perf_counter() - self.origin)
+
+    def _install_import_hook(self):
+        import builtins
+        original = builtins.__import__
+        profile = self
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level or name in sys.modules:
+                return original(name, globals, locals, fromlist, level)
+            stack = profile._local.__dict__.setdefault('stack', [])
+            stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                return original(name, globals, locals, fromlist, level)
+            finally:
+                elapsed = time.perf_counter() - started
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                package = name.partition('.')[0]
+                with profile._lock:
+                    profile._imports[package] = profile._imports.get(package, 0.0) + elapsed - nested
+
+        builtins.__import__ = timed_import
+
+    def report(self, title: str, top: int = 12):
+        """Log the milestones so far and the slowest imports; printed too with --profile-startup."""
+        with self._lock:
+            marks = sorted(self._marks.items(), key=lambda item: item[1])
+            imports = sorted(self._imports.items(), key=lambda item: item[1], reverse=True)[:top]
+        lines = [f"{title} (seconds since launch):"]
+        lines += [f"  {seconds:8.3f}  {name}" for name, seconds in marks]
+        if imports:
+            lines.append(f"Import time by package (self time, slowest {len(imports)}):")
+            lines += [f"  {seconds:8.3f}  {package}" for package, seconds in imports]
+        text = '\n'.join(lines)
+        logging.info('%s', text)
+        if self.enabled:
+            print(text, file=sys.stderr, flush=True)
+
+STARTUP = StartupProfile()
+
+
+FFMPEG_PATH: str | None = None
+
+def _ensure_ffmpeg():
+    try:
+        global FFMPEG_PATH
+        # Prefer bundled ffmpeg next to the executable
+        base_dir = getattr(sys, '_MEIPASS', os.path.dirname(sys.executable)) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
+        ffmpeg_name = 'ffmpeg.exe' if os.name == 'nt' else 'ffmpeg'
+        local_ffmpeg = next((path for path in (os.path.join(base_dir, ffmpeg_name), os.path.join(base_dir, 'bin', ffmpeg_name))
+                             if os.path.exists(path)), None)
+        if local_ffmpeg:
+            FFMPEG_PATH = local_ffmpeg
+        else:
+            FFMPEG_PATH = shutil.which('ffmpeg')
+        if FFMPEG_PATH:
+            logging.debug('ffmpeg path resolved: %s', FFMPEG_PATH)
+            # Ensure its directory is first on PATH
+            os.environ['PATH'] = os.path.dirname(FFMPEG_PATH) + os.pathsep + os.environ.get('PATH', '')
+            return
+        msg = 'FFmpeg not found. Please install FFmpeg or place ffmpeg.exe next to the application.'
+        logging.error(msg)
+        if os.name == 'nt' and DEBUG_MODE:
+            try:
+                import ctypes
+                ctypes.windll.user32.MessageBoxW(None, msg, 'Whisper Transcriber', 0x10)
+            except Exception:
+                pass
+    except Exception:
+        pass
+
+# Resolved on first use (see _ffmpeg_executable), so starting the app does not scan PATH
+_FFMPEG_RESOLVED = False
+
+SAMPLE_RATE = 16000
+CHUNK_SECONDS = 30
+CHUNK_SAMPLES = CHUNK_SECONDS * SAMPLE_RATE
+N_FFT = 400
+HOP_LENGTH = 160
+N_FRAMES = CHUNK_SAMPLES // HOP_LENGTH  # mel frames per 30 s chunk
+
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.flac', '.ogg', '.opus', '.aac', '.wma', '.webm', '.mp4', '.mkv'}
+
+def _audio_files(path) -> list:
+    """``path`` itself when it is a file, or the audio files found under a directory (sorted)."""
+    path = Path(path)
+    if path.is_dir():
+        return sorted(p for p in path.rglob('*') if p.is_file() and p.suffix.lower() in AUDIO_EXTENSIONS)
+    return [path] if path.is_file() else []
+
+def _ffmpeg_executable():
+    global _FFMPEG_RESOLVED
+    if not _FFMPEG_RESOLVED:
+        _FFMPEG_RESOLVED = True
+        _ensure_ffmpeg()
+    return FFMPEG_PATH or shutil.which('ffmpeg') or 'ffmpeg'
+
+# Imported by preload_modules, in this order; torch and whisper dominate the first transcription
+PRELOAD_MODULES = ('numpy', 'psutil', 'torch', 'whisper')
+_PRELOAD_THREAD = None
+
+def preload_modules(on_done=None):
+    """Import PRELOAD_MODULES and resolve ffmpeg on a background thread (once).
+    ``on_done()`` is called from that thread when everything is imported.
+    """
+    global _PRELOAD_THREAD
+    if _PRELOAD_THREAD is not None:
+        return
+
+    def run():
+        STARTUP.mark('preload started')
+        _ffmpeg_executable()
+        for name in PRELOAD_MODULES:
+            try:
+                __import__(name)  # through builtins.__import__, so --profile-startup sees it
+            except Exception as e:
+                logging.info('Preloading %s failed: %s', name, e)
+            STARTUP.mark(f'{name} imported')
+        STARTUP.mark('preload finished')
+        if on_done is not None:
+            on_done()
+
+    _PRELOAD_THREAD = threading.Thread(target=run, name='preload', daemon=True)
+    _PRELOAD_THREAD.start()
+
+def _ffmpeg_pcm_command(file_path: str):
+    """ffmpeg command that writes mono 16 kHz float32 PCM (f32le) to stdout.
+    f32le is whisper's working dtype, so samples can land in their final buffer as-is.
+    """
+    return [_ffmpeg_executable(), '-nostdin', '-v', 'error', '-threads', '0', '-i', file_path,
+            '-f', 'f32le', '-acodec', 'pcm_f32le', '-ac', '1', '-ar', str(SAMPLE_RATE), '-']
+
+def _probe_duration(file_path: str):
+    """Return the container duration in seconds as reported by ffmpeg, or None."""
+    try:
+        import re
+        res = subprocess.run([_ffmpeg_executable(), '-nostdin', '-hide_banner', '-i', file_path],
+                             capture_output=True)
+        stderr = (res.stderr or b'').decode('utf-8', errors='ignore')
+        m = re.search(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)', stderr)
+        if m:
+            return int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3))
+    except Exception as e:
+        logging.debug('Duration probe failed for %s: %s', file_path, e)
+    return None
+
+def _drain_stderr(proc):
+    """Collect ffmpeg stderr on a side thread so a chatty decoder can't block on a full pipe."""
+    chunks = []
+    def _reader():
+        try:
+            for line in proc.stderr:
+                if len(chunks) < 200:
+                    chunks.append(line)
+        except Exception:
+            pass
+    t = threading.Thread(target=_reader, daemon=True)
+    t.start()
+    return t, chunks
+
+def _read_pcm_into(stream, buf, offset: int) -> int:
+    """Fill float32 ``buf[offset:]`` straight from ``stream``; returns samples read (short on EOF)."""
+    view = memoryview(buf).cast('B')
+    pos = start = offset * buf.itemsize
+    while pos < len(view):
+        n = stream.readinto(view[pos:])
+        if not n:
+            break
+        pos += n
+    return (pos - start) // buf.itemsize
+
+def _ffmpeg_load_audio(file_path: str):
+    """Decode through an ffmpeg pipe into one preallocated float32 buffer (no temp files)."""
+    import numpy as np
+    duration = _probe_duration(file_path)
+    # Size the buffer from the probed duration (+1 s slack); grow only if the estimate was short
+    capacity = int((duration or 600.0) * SAMPLE_RATE) + SAMPLE_RATE
+    audio = np.empty(capacity, dtype=np.float32)
+    cmd = _ffmpeg_pcm_command(file_path)
+    logging.debug('Running ffmpeg pipe decode: %s', ' '.join([f'"{c}"' if ' ' in str(c) else str(c) for c in cmd]))
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr_thread, stderr_chunks = _drain_stderr(proc)
+    filled = 0
+    try:
+        while True:
+            filled += _read_pcm_into(proc.stdout, audio, filled)
+            if filled < len(audio):
+                break
+            grown = np.empty(len(audio) + len(audio) // 2, dtype=np.float32)
+            grown[:filled] = audio
+            audio = grown
+    finally:
+        proc.stdout.close()
+        rc = proc.wait()
+        stderr_thread.join(timeout=1.0)
+    if rc != 0:
+        # Samples read before a failure are only part of the file; never pass them off as complete
+        stderr = b''.join(stderr_chunks).decode('utf-8', errors='ignore')
+        raise RuntimeError(f'ffmpeg failed on {file_path} after {filled / SAMPLE_RATE:.1f}s of audio: rc={rc} stderr={stderr}')
+    if filled < capacity // 2:
+        # Duration probe was far off; don't pin the oversized buffer for the whole job
+        return audio[:filled].copy()
+    return audio[:filled]
+
+def _iter_audio_windows(file_path: str, window_samples: int = CHUNK_SAMPLES):
+    """Yield ``(offset, samples)`` windows read incrementally from an ffmpeg pipe.
+    Only the current window is held in memory, so usage stays flat regardless of file length.
+    """
+    import numpy as np
+    cmd = _ffmpeg_pcm_command(file_path)
+    logging.debug('Running ffmpeg streaming decode: %s', ' '.join([f'"{c}"' if ' ' in str(c) else str(c) for c in cmd]))
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr_thread, stderr_chunks = _drain_stderr(proc)
+    offset = 0
+    try:
+        while True:
+            window = np.empty(window_samples, dtype=np.float32)
+            with METRICS.timer('audio_decode'):
+                n = _read_pcm_into(proc.stdout, window, 0)
+            if n == 0:
+                break
+            yield offset, window[:n]
+            offset += n
+            if n < window_samples:
+                break
+    finally:
+        # Consumer may stop early (user pressed Stop); don't leave ffmpeg decoding in the background
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        rc = proc.wait()
+        stderr_thread.join(timeout=1.0)
+    if rc != 0 and offset == 0:
+        stderr = b''.join(stderr_chunks).decode('utf-8', errors='ignore')
+        raise RuntimeError(f'ffmpeg failed: rc={rc} stderr={stderr}')
+
+def _prefetch(iterable, depth: int, stop_event, name: str = 'pipeline-stage'):
+    """Run ``iterable`` on its own thread, buffering at most ``depth`` items ahead of the consumer.
+
+    The bounded queue gives backpressure, so memory stays bounded however far the producer could
+    run ahead. Setting ``stop_event`` or closing this generator stops the producer, which then
+    closes its source (e.g. killing a streaming ffmpeg decode). Producer errors are re-raised here.
+    """
+    if depth <= 0:
+        yield from iterable
+        return
+    items = queue.Queue(maxsize=depth)
+    abandoned = threading.Event()
+    METRICS.watch_queue(name, items)
+
+    def put(entry):
+        while not (stop_event.is_set() or abandoned.is_set()):
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        source = iter(iterable)
+        try:
+            for item in source:
+                if not put(('item', item)):
+                    break
+            else:
+                put(('done', None))
+        except BaseException as e:
+            put(('error', e))
+        finally:
+            if hasattr(source, 'close'):
+                source.close()
+
+    producer = threading.Thread(target=produce, name=name, daemon=True)
+    producer.start()
+    try:
+        while True:
+            try:
+                kind, item = items.get(timeout=0.1)
+            except queue.Empty:
+                if stop_event.is_set() or not producer.is_alive() and items.empty():
+                    return
+                continue
+            if kind == 'done':
+                return
+            if kind == 'error':
+                raise item
+            yield item
+    finally:
+        abandoned.set()
+        METRICS.unwatch_queue(items)
+
+def _iter_array_windows(audio, spans):
+    """Yield ``(offset, samples)`` views over an already decoded array for ``(offset, length)`` spans."""
+    for i, n in spans:
+        yield i, audio[i:i + n]
+
+def _fixed_chunks(total_samples: int, chunk_samples: int = CHUNK_SAMPLES):
+    """Consecutive ``(offset, length)`` chunk spans covering ``total_samples``."""
+    return [(i, min(chunk_samples, total_samples - i)) for i in range(0, total_samples, chunk_samples)]
+
+VAD_FRAME_SAMPLES = 480  # 30 ms analysis frames
+
+def _frame_energy_db(audio, frame: int = VAD_FRAME_SAMPLES, block_frames: int = 20000):
+    """Per-frame mean power in dBFS. Computed blockwise so long files never get a squared copy."""
+    import numpy as np
+    n = len(audio) // frame
+    power = np.empty(n, dtype=np.float32)
+    for s in range(0, n, block_frames):
+        e = min(n, s + block_frames)
+        blk = np.asarray(audio[s * frame:e * frame], dtype=np.float32).reshape(-1, frame)
+        power[s:e] = np.einsum('ij,ij->i', blk, blk) / frame
+    return 10.0 * np.log10(power + 1e-10)
+
+class SpeechDetector:
+    """Vectorized energy-based voice activity detection.
+
+    Frames are compared against a threshold placed between the noise floor and the speech level
+    of the frames seen so far (the whole file, or the last ``history_frames`` while streaming).
+    """
+
+    def __init__(self, history_frames: int | None = None, min_silence_s: float = 1.0, pad_s: float = 0.3):
+        import numpy as np
+        self.history_frames = history_frames
+        self.min_silence_frames = int(min_silence_s * SAMPLE_RATE / VAD_FRAME_SAMPLES)
+        self.pad_frames = int(pad_s * SAMPLE_RATE / VAD_FRAME_SAMPLES)
+        self._history = np.empty(0, dtype=np.float32)
+
+    def _threshold(self):
+        import numpy as np
+        floor, level = np.percentile(self._history, [10, 90])
+        if level < -60.0:
+            return None  # digital silence throughout
+        if level - floor < 12.0:
+            return -60.0  # no clear silence/speech split: only drop near-silent frames
+        return max(floor + 0.3 * (level - floor), -60.0)
+
+    def regions(self, audio):
+        """Return ``[(start, end)]`` sample ranges of ``audio`` that contain speech."""
+        import numpy as np
+        db = _frame_energy_db(audio)
+        if not len(db):
+            return [(0, len(audio))] if len(audio) else []
+        self._history = np.concatenate((self._history, db))
+        if self.history_frames:
+            self._history = self._history[-self.history_frames:]
+        threshold = self._threshold()
+        if threshold is None:
+            return []
+        active = db > threshold
+        # Pad speech on both sides so word onsets and trailing consonants are kept
+        if self.pad_frames:
+            active = np.convolve(active, np.ones(2 * self.pad_frames + 1), mode='same') > 0
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], active.astype(np.int8), [0]))))
+        starts, ends = edges[0::2], edges[1::2]
+        if not len(starts):
+            return []
+        # Bridge pauses shorter than min_silence so sentences aren't cut into fragments
+        keep = np.concatenate(([True], starts[1:] - ends[:-1] >= self.min_silence_frames))
+        starts = starts[keep]
+        ends = np.concatenate((ends[np.flatnonzero(keep)[1:] - 1], ends[-1:]))
+        # The trailing partial frame belongs to the last region if it reaches the end
+        return [(int(s) * VAD_FRAME_SAMPLES,
+                 len(audio) if e == len(db) else int(e) * VAD_FRAME_SAMPLES)
+                for s, e in zip(starts, ends)]
+
+def _iter_speech_windows(windows, detector, min_samples: int = SAMPLE_RATE):
+    """Trim streamed windows to their speech span, dropping windows that are entirely silent.
+    Spans are widened to ``min_samples`` within their window, as ``_speech_chunks`` does, so short
+    utterances survive.
+    """
+    for offset, window in windows:
+        regions = detector.regions(window)
+        if not regions:
+            continue
+        start, end = regions[0][0], regions[-1][1]
+        if end - start < min_samples:
+            start = max(0, min(start, len(window) - min_samples))
+            end = max(end, start + min_samples)
+        start -= start % 160
+        yield offset + start, window[start:end]
+
+def _speech_chunks(regions, total_samples: int, max_samples: int = CHUNK_SAMPLES, min_samples: int = SAMPLE_RATE):
+    """Pack speech regions into ``(offset, length)`` chunks of at most ``max_samples``.
+
+    Neighbouring regions share a chunk when they fit; silence longer than a chunk never
+    reaches the decoder. Chunks are widened to ``min_samples`` so short utterances survive.
+    """
+    chunks = []
+    cur_start = cur_end = None
+    for start, end in regions:
+        start -= start % 160  # keep offsets on mel hop boundaries
+        while end - start > max_samples:
+            if cur_start is not None:
+                chunks.append((cur_start, cur_end))
+                cur_start = None
+            chunks.append((start, start + max_samples))
+            start += max_samples
+        if cur_start is not None and end - cur_start <= max_samples:
+            cur_end = end
+            continue
+        if cur_start is not None:
+            chunks.append((cur_start, cur_end))
+        cur_start, cur_end = start, end
+    if cur_start is not None:
+        chunks.append((cur_start, cur_end))
+    spans = []
+    for k, (s, e) in enumerate(chunks):
+        e = min(e, total_samples)
+        if e - s < min_samples:
+            # Widen forward, and backward where the file ends first
+            s = max(0, min(s, total_samples - min_samples))
+            s -= s % 160
+            e = min(max(e, s + min_samples), total_samples)
+            # Never decode samples twice: start the next chunk after this one, and join the previous
+            # chunk if both fit or else take its tail
+            if k + 1 < len(chunks) and chunks[k + 1][0] < e:
+                chunks[k + 1] = (e, chunks[k + 1][1])
+            if spans and s < spans[-1][0] + spans[-1][1]:
+                prev_start, _ = spans.pop()
+                if e - prev_start <= max_samples:
+                    s = prev_start
+                else:
+                    spans.append((prev_start, s - prev_start))
+        spans.append((s, e - s))
+    return spans
+
+def _decode_audio(file_path: str):
+    """Decode audio as float32 16k mono via an ffmpeg pipe, falling back to whisper.load_audio.
+    Returns numpy.ndarray.
+    """
+    try:
+        with METRICS.timer('audio_decode'):
+            return _ffmpeg_load_audio(file_path)
+    except Exception as e:
+        logging.warning('ffmpeg pipe decode failed, falling back to whisper.load_audio: %s', e)
+        try:
+            import whisper
+            with METRICS.timer('audio_decode'):
+                return whisper.load_audio(file_path)
+        except Exception as fe:
+            logging.error('Audio decode fallback failed: %s', fe)
+            raise
+
+_CONTENT_KEYS = {}  # (path, size, mtime) -> key, least recently used first
+_CONTENT_KEYS_MAX = 1024  # bounded: a long-running --serve sees a new temporary path per upload
+_CONTENT_KEYS_LOCK = threading.Lock()
+
+def _file_content_key(file_path: str) -> str:
+    """Hash of the file's bytes plus its size and mtime; memoized per (path, size, mtime)."""
+    import hashlib
+    st = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), st.st_size, st.st_mtime_ns)
+    with _CONTENT_KEYS_LOCK:
+        key = _CONTENT_KEYS.pop(memo_key, None)
+        if key is not None:
+            _CONTENT_KEYS[memo_key] = key
+            return key
+    h = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    h.update(f'{st.st_size}:{st.st_mtime_ns}'.encode())
+    key = h.hexdigest()
+    with _CONTENT_KEYS_LOCK:
+        _CONTENT_KEYS[memo_key] = key
+        while len(_CONTENT_KEYS) > _CONTENT_KEYS_MAX:
+            del _CONTENT_KEYS[next(iter(_CONTENT_KEYS))]
+    return key
+
+class DecodedAudioCache:
+    """Size-bounded LRU cache of decoded 16 kHz float32 PCM stored as ``.npy`` files.
+
+    Entries are opened memory-mapped, so re-runs skip ffmpeg entirely and processes reading the
+    same file share the OS page cache. Recency is tracked through the files' mtime.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f'{key}.npy'
+
+    def load(self, key: str):
+        import numpy as np
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            audio = np.load(path, mmap_mode='r')
+            os.utime(path)  # mark as most recently used
+            return audio
+        except Exception as e:
+            logging.warning('Discarding unreadable audio cache entry %s: %s', path, e)
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+
+    def store(self, key: str, audio):
+        """Persist ``audio`` and return a memory-mapped view of it (or ``audio`` if writing fails)."""
+        import numpy as np
+        if audio.nbytes > self.max_bytes:
+            return audio
+        path = self._path(key)
+        tmp = path.with_name(f'{key}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                np.save(f, audio)
+            os.replace(tmp, path)
+        except Exception as e:
+            logging.warning('Could not write audio cache entry %s: %s', path, e)
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+            return audio
+        self.evict(keep=path)
+        return self.load(key) if path.exists() else audio
+
+    def evict(self, keep: Path | None = None):
+        """Drop least recently used entries until the cache fits in ``max_bytes``."""
+        with self._lock:
+            entries = []
+            for p in self.root.glob('*.npy'):
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+            total = sum(size for _, size, _ in entries)
+            for _, size, p in sorted(entries, key=lambda e: e[0]):
+                if total <= self.max_bytes:
+                    break
+                if keep is not None and p == keep:
+                    continue
+                try:
+                    p.unlink()
+                    total -= size
+                    logging.debug('Evicted audio cache entry %s (%d bytes)', p, size)
+                except OSError:
+                    pass  # still mapped by another process (Windows); retry on the next store
+
+_AUDIO_CACHE: DecodedAudioCache | None = None
+
+def _audio_cache():
+    """The process-wide decoded-audio cache, or None when disabled."""
+    global _AUDIO_CACHE
+    if _AUDIO_CACHE is None and APP_OPTIONS['audio_cache_mb'] > 0:
+        _AUDIO_CACHE = DecodedAudioCache(_app_data_dir('cache', 'audio'), APP_OPTIONS['audio_cache_mb'] * 1024 * 1024)
+    return _AUDIO_CACHE
+
+class TranscriptCache:
+    """On-disk cache of per-chunk decode results, stored in SQLite with size-bounded LRU eviction.
+
+    Keys cover everything that affects a chunk's result (audio content, chunk span, model,
+    decoding options), so re-runs only decode the chunks that actually changed.
+    """
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @staticmethod
+    def key(*parts) -> str:
+        import hashlib
+        return hashlib.blake2b(json.dumps(parts, default=repr).encode('utf-8'), digest_size=20).hexdigest()
+
+    def _connect(self):
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+            conn.execute('CREATE TABLE IF NOT EXISTS results ('
+                         'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str):
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+                conn.commit()
+                return json.loads(row[0])
+            except (sqlite3.Error, ValueError) as e:
+                logging.debug('Transcript cache read failed: %s', e)
+                return None
+
+    def put(self, key: str, value):
+        data = json.dumps(value)
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute('INSERT OR REPLACE INTO results (key, value, size, last_used) VALUES (?, ?, ?, ?)',
+                             (key, data, len(data) + len(key), time.time()))
+                self._evict(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                logging.debug('Transcript cache write failed: %s', e)
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in conn.execute('SELECT key, size FROM results ORDER BY last_used'):
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        conn.executemany('DELETE FROM results WHERE key = ?', doomed)
+        logging.debug('Evicted %d transcript cache entries', len(doomed))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_TRANSCRIPT_CACHE: TranscriptCache | None = None
+
+def _transcript_cache():
+    """The process-wide transcript result cache, or None when disabled."""
+    global _TRANSCRIPT_CACHE
+    if _TRANSCRIPT_CACHE is None and APP_OPTIONS['transcript_cache_mb'] > 0:
+        _TRANSCRIPT_CACHE = TranscriptCache(_app_data_dir('cache', 'transcripts.sqlite3'),
+                                            APP_OPTIONS['transcript_cache_mb'] * 1024 * 1024)
+    return _TRANSCRIPT_CACHE
+
+class TranscriptJournal:
+    """Append-only record of a job's finished chunks, so an interrupted job resumes where it stopped.
+
+    Each line is ``{"position": samples covered so far, "segments": [[start, end, text], ...]}``,
+    flushed and fsync'd as soon as the chunk is emitted. The file is named after everything that
+    affects the output (audio content, model, decoding options, chunking mode), so a journal is
+    only ever replayed into an identical job. It is deleted once the job completes.
+    """
+    MAX_AGE_DAYS = 30
+
+    def __init__(self, key: str):
+        self.path = _app_data_dir('journals', f'{key}.jsonl')
+        self._file = None
+
+    def load(self):
+        """``(position, segments)`` recorded so far; ``(0, [])`` without a journal. A line torn by
+        a crash ends the replay and is cut off so appends continue from the last complete entry."""
+        position, segments, valid = 0, [], 0
+        try:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        entry_position, entry_segments = entry['position'], entry['segments']
+                    except (ValueError, KeyError, TypeError):
+                        break
+                    if not line.endswith(b'\n'):
+                        break
+                    position = entry_position
+                    segments.extend(tuple(seg) for seg in entry_segments)
+                    valid += len(line)
+        except FileNotFoundError:
+            return 0, []
+        if valid < self.path.stat().st_size:
+            os.truncate(self.path, valid)
+        return position, segments
+
+    def append(self, position: int, segments):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps({'position': position, 'segments': segments}, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    def prune(cls):
+        """Delete journals of jobs nobody resumed within MAX_AGE_DAYS."""
+        cutoff = time.time() - cls.MAX_AGE_DAYS * 86400
+        for path in _app_data_dir('journals').glob('*.jsonl'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+def _cached_audio(file_path: str):
+    """Memory-mapped decoded audio for ``file_path`` if it is already cached, else None."""
+    cache = _audio_cache()
+    if cache is None:
+        return None
+    try:
+        return cache.load(_file_content_key(file_path))
+    except Exception as e:
+        logging.debug('Audio cache lookup failed for %s: %s', file_path, e)
+        return None
+
+def _safe_load_audio(file_path: str):
+    """Load audio as float32 16k mono, serving it from the decoded-audio cache when possible.
+    Returns numpy.ndarray (a read-only memmap when cached).
+    """
+    audio = _cached_audio(file_path)
+    if audio is not None:
+        logging.debug('Decoded audio cache hit for %s', file_path)
+        return audio
+    audio = _decode_audio(file_path)
+    cache = _audio_cache()
+    if cache is not None:
+        try:
+            audio = cache.store(_file_content_key(file_path), audio)
+        except Exception as e:
+            logging.debug('Audio cache store failed for %s: %s', file_path, e)
+    return audio
+
+def _log_mel_spectrogram(audio, n_mels: int = 80, pad_samples: int = 0, block_frames: int = 60000):
+    """Log-mel spectrogram of a whole signal, computed once in blocks of ``block_frames``.
+
+    Matches ``whisper.log_mel_spectrogram(audio, n_mels, padding=pad_samples)`` (STFT frames are
+    identical, and the dynamic range is clamped against the global maximum) without ever holding
+    the complex STFT of the full file. Returns ``(mel, floor)`` where ``floor`` is the value
+    silence maps to, used to pad windows that end before 30 s.
+    """
+    import numpy as np
+    import torch
+    import whisper
+    total = len(audio) + pad_samples
+    n_frames = total // HOP_LENGTH
+    if total <= N_FFT:
+        mel = whisper.log_mel_spectrogram(np.ascontiguousarray(audio, dtype=np.float32), n_mels, padding=pad_samples)
+        return mel, float(mel.min()) if mel.numel() else 0.0
+
+    def virtual(p0, p1):
+        # Samples [p0, p1) of the audio followed by ``pad_samples`` zeros
+        out = np.zeros(max(p1 - p0, 0), dtype=np.float32)
+        end = min(p1, len(audio))
+        if end > p0:
+            out[:end - p0] = audio[p0:end]
+        return out
+
+    half = N_FFT // 2
+    window = torch.hann_window(N_FFT)
+    filters = whisper.audio.mel_filters('cpu', n_mels)
+    mel = torch.empty((n_mels, n_frames), dtype=torch.float32)
+    peak = -np.inf
+    for f0 in range(0, n_frames, block_frames):
+        f1 = min(n_frames, f0 + block_frames)
+        a, b = f0 * HOP_LENGTH - half, (f1 - 1) * HOP_LENGTH + half
+        parts = []
+        if a < 0:
+            parts.append(virtual(1, 1 - a)[::-1])  # reflect padding at the start, as center=True does
+        parts.append(virtual(max(a, 0), min(b, total)))
+        if b > total:
+            parts.append(virtual(2 * total - b - 1, total - 1)[::-1])  # reflect padding at the end
+        seg = torch.from_numpy(np.concatenate(parts))
+        stft = torch.stft(seg, N_FFT, HOP_LENGTH, window=window, center=False, return_complex=True)
+        log_spec = torch.clamp(filters @ (stft.abs() ** 2), min=1e-10).log10()
+        mel[:, f0:f1] = log_spec
+        peak = max(peak, float(log_spec.max()))
+    mel.clamp_(min=peak - 8.0).add_(4.0).div_(4.0)
+    return mel, (peak - 8.0 + 4.0) / 4.0
+
+def _mel_window(mel, floor: float, start: int, length: int):
+    """``[n_mels, N_FRAMES]`` input for the audio span ``[start, start + length)``.
+
+    Full 30 s spans are zero-copy views into ``mel``; shorter ones are padded with silence.
+    """
+    import torch
+    f0 = start // HOP_LENGTH
+    n = min(N_FRAMES, -(-length // HOP_LENGTH))
+    if n == N_FRAMES and f0 + N_FRAMES <= mel.shape[1]:
+        return mel[:, f0:f0 + N_FRAMES]
+    out = torch.full((mel.shape[0], N_FRAMES), floor, dtype=mel.dtype)
+    part = mel[:, f0:f0 + n]
+    out[:, :part.shape[1]] = part
+    return out
+
+class DecodingCancelled(Exception):
+    """Raised from inside a decode once every chunk being decoded was cancelled."""
+
+class _CancellationFilter:
+    """Whisper logit filter that checks for cancellation before every decoded token.
+
+    ``stops`` holds one event (anything with ``is_set()``) per audio in the batch. A cancelled
+    row is forced to end-of-text so the rest of the batch carries on, and ``on_cancel(index)``
+    is called once for it; once every row is cancelled the decode is abandoned with DecodingCancelled.
+    """
+
+    def __init__(self, stops, eot: int, on_cancel=None):
+        self.stops = stops
+        self.eot = eot
+        self.on_cancel = on_cancel
+        self._seen = set()
+
+    def apply(self, logits, tokens):
+        cancelled = [stop.is_set() for stop in self.stops]
+        if not any(cancelled):
+            return
+        if all(cancelled):
+            raise DecodingCancelled()
+        group = logits.shape[0] // len(self.stops)  # rows per audio (beam search / best-of)
+        for row, flag in enumerate(cancelled):
+            if flag:
+                if row not in self._seen and self.on_cancel is not None:
+                    self._seen.add(row)
+                    self.on_cancel(row)
+                rows = logits[row * group:(row + 1) * group]
+                rows.fill_(-float('inf'))
+                rows[:, self.eot] = 0
+
+def _decode(model, mel, decode_options, stops=None, on_cancel=None):
+    """``whisper.decode`` that stops within one token of every event in ``stops`` being set.
+    Encoder and decoder time, chunks and tokens are recorded in METRICS.
+    """
+    from whisper.decoding import DecodingTask
+    if stops is not None and all(stop.is_set() for stop in stops):
+        raise DecodingCancelled()
+    single = mel.ndim == 2
+    batch = mel.unsqueeze(0) if single else mel
+    task = DecodingTask(model, decode_options)
+    if stops is not None:
+        task.logit_filters.append(_CancellationFilter(stops, task.tokenizer.eot, on_cancel))
+    encode = task._get_audio_features
+    encoder_seconds = []
+
+    def timed_encode(chunk_mels):
+        started = time.perf_counter()
+        try:
+            return encode(chunk_mels)
+        finally:
+            encoder_seconds.append(time.perf_counter() - started)
+
+    task._get_audio_features = timed_encode
+    started = time.perf_counter()
+    try:
+        results = task.run(batch)
+    finally:
+        encoded = sum(encoder_seconds)
+        METRICS.record('encoder', encoded, len(batch))
+        METRICS.record('decoder', time.perf_counter() - started - encoded, len(batch))
+    METRICS.count('chunks', len(results))
+    METRICS.count('tokens', sum(len(result.tokens) for result in results))
+    return results[0] if single else results
+
+def _decode_mel_batch(model, mels, decode_options, stops=None, on_cancel=None):
+    """Decode a list of ``[n_mels, 3000]`` chunk mels in one batched pass; results keep input order.
+    If the batched pass fails, chunks are retried one by one and failures come back as None.
+    ``stops`` are per-chunk cancellation events, checked at every token (see _CancellationFilter).
+    """
+    import torch
+    if len(mels) == 1:
+        return [_decode(model, mels[0], decode_options, stops)]
+    try:
+        return list(_decode(model, torch.stack(mels), decode_options, stops, on_cancel))
+    except DecodingCancelled:
+        raise
+    except Exception as e:
+        logging.warning('Batched decode of %d chunks failed, retrying individually: %s', len(mels), e)
+    results = []
+    for k, mel in enumerate(mels):
+        try:
+            results.append(_decode(model, mel, decode_options, None if stops is None else stops[k:k + 1]))
+        except DecodingCancelled:
+            results.append(None)
+        except Exception as chunk_error:
+            logging.error('Chunk decode failed: %s', chunk_error)
+            results.append(None)
+    return results
+
+TIME_PRECISION = 0.02  # seconds per timestamp token (two mel frames)
+CUT_SEARCH_SAMPLES = 5 * SAMPLE_RATE  # how far back from a window's end to look for a quiet cut
+
+class _StreamReader:
+    """Forward-only random access over streamed ``(offset, samples)`` windows.
+
+    ``read`` may be called with non-decreasing start positions; audio before the start is dropped,
+    including whole windows when the first read starts further in (a resumed job).
+    """
+
+    def __init__(self, windows):
+        import numpy as np
+        self._windows = iter(windows)
+        self._buf = np.empty(0, dtype=np.float32)
+        self._buf_start = 0
+        self._eof = False
+
+    def __call__(self, start: int, n: int):
+        import numpy as np
+        while True:
+            if start > self._buf_start:
+                drop = min(start - self._buf_start, len(self._buf))
+                self._buf = self._buf[drop:]
+                self._buf_start += drop
+            if self._eof or self._buf_start == start and len(self._buf) >= n:
+                break
+            window = next(self._windows, None)
+            if window is None:
+                self._eof = True
+            else:
+                self._buf = np.concatenate((self._buf, window[1]))
+        return self._buf[:n]
+
+def _quiet_cut(window) -> int:
+    """Length to keep of ``window`` so it ends on the quietest frame of its last few seconds."""
+    import numpy as np
+    search = min(CUT_SEARCH_SAMPLES, len(window))
+    db = _frame_energy_db(window[len(window) - search:])
+    if not len(db):
+        return len(window)
+    cut = len(window) - search + int(np.argmin(db)) * VAD_FRAME_SAMPLES + VAD_FRAME_SAMPLES // 2
+    return cut - cut % 160
+
+def _timestamp_segments(tokens, tokenizer, time_offset: float, window_duration: float):
+    """Split decoded tokens into ``(start, end, text)`` segments using Whisper's timestamp tokens.
+
+    Returns ``(segments, consumed, partial)``: ``consumed`` is how many seconds of the window were
+    covered by complete segments (None when the whole window was used) and ``partial`` is the
+    unfinished trailing segment, if any.
+    """
+    ts_begin = tokenizer.timestamp_begin
+    is_ts = [t >= ts_begin for t in tokens]
+    single_timestamp_ending = is_ts[-2:] == [False, True]
+    consecutive = [k + 1 for k in range(len(tokens) - 1) if is_ts[k] and is_ts[k + 1]]
+    text_of = lambda toks: tokenizer.decode([t for t in toks if t < tokenizer.eot]).strip()
+    segments = []
+    if consecutive:
+        slices = consecutive + ([len(tokens)] if single_timestamp_ending else [])
+        last = 0
+        for cur in slices:
+            piece = tokens[last:cur]
+            start = (piece[0] - ts_begin) * TIME_PRECISION
+            end = min((piece[-1] - ts_begin) * TIME_PRECISION, window_duration)
+            text = text_of(piece)
+            if text:
+                segments.append((time_offset + start, time_offset + end, text))
+            last = cur
+        if single_timestamp_ending:
+            return segments, None, None
+        # The window ended mid-segment; the caller either carries it over or keeps it as is
+        consumed = (tokens[last - 1] - ts_begin) * TIME_PRECISION
+        text = text_of(tokens[last:])
+        partial = (time_offset + consumed, time_offset + window_duration, text) if text else None
+        return segments, consumed, partial
+    duration = window_duration
+    stamps = [t for t, ts in zip(tokens, is_ts) if ts]
+    if stamps and stamps[-1] != ts_begin:
+        duration = min((stamps[-1] - ts_begin) * TIME_PRECISION, window_duration)
+    text = text_of(tokens)
+    return ([(time_offset, time_offset + duration, text)] if text else []), None, None
+
+def _iter_boundary_windows(model, read, decode_options, stop_event, start: int = 0, end: int | None = None,
+                           mel_for=None, cache=None, cache_key=None, runner=None):
+    """Seek-based decoding between sample positions ``start`` and ``end`` (EOF when None).
+
+    Windows are cut at a quiet frame near their 30 s limit, and the next window starts where the
+    last complete segment ended, so words are never split and partial segments are re-decoded
+    with full context. ``mel_for(start, window)`` may supply precomputed mel windows, and
+    ``cache``/``cache_key(seek, end)`` serve previously decoded windows from a TranscriptCache.
+    With a ``runner`` (BatchingDecoder) the model is only ever called from its thread.
+    Yields ``(segments, position)`` per window.
+    """
+    import whisper
+    from whisper.tokenizer import get_tokenizer
+    tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                              language=decode_options.language, task=decode_options.task)
+    seek = start
+    while not stop_event.is_set():
+        key = cache_key(seek, end) if cache is not None else None
+        hit = cache.get(key) if key is not None else None
+        if hit is not None:
+            seek = hit['seek']
+            yield [tuple(seg) for seg in hit['segments']], seek
+            if hit['last']:
+                break
+            continue
+        want = CHUNK_SAMPLES if end is None else min(CHUNK_SAMPLES, end - seek)
+        window = read(seek, want)
+        if len(window) < SAMPLE_RATE // 5:
+            break
+        more_follows = len(window) == CHUNK_SAMPLES and (end is None or seek + CHUNK_SAMPLES < end)
+        if more_follows:
+            window = window[:_quiet_cut(window)]
+        if mel_for is not None:
+            mel = mel_for(seek, window)
+        else:
+            with METRICS.timer('mel'):
+                mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(window), model.dims.n_mels)
+        if runner is not None:
+            result = runner.decode([mel.to(model.device)], decode_options, stop_event)[0]
+        else:
+            result = _decode(model, mel.to(model.device), decode_options, [stop_event])
+        if stop_event.is_set():
+            break  # cut short by cancellation; never cached
+        segments, consumed, partial = _timestamp_segments(result.tokens, tokenizer, seek / SAMPLE_RATE, len(window) / SAMPLE_RATE)
+        advance = len(window)
+        if consumed is not None:
+            carried = int(consumed * SAMPLE_RATE)
+            carried -= carried % 160
+            if carried >= SAMPLE_RATE:
+                advance = carried  # re-decode the unfinished segment at the start of the next window
+            elif partial is not None:
+                segments.append(partial)  # too little progress to carry over; keep it as is
+        seek += advance
+        last = advance == len(window) and not more_follows
+        if key is not None:
+            cache.put(key, {'segments': segments, 'seek': seek, 'last': last})
+        yield segments, seek
+        if last:
+            break
+
+def _quantized_model_path(model_name: str) -> Path:
+    """Where the int8 copy of ``model_name`` is kept, tied to its source checkpoint and torch build."""
+    import hashlib
+    import torch
+    source = [model_name, torch.__version__]
+    if os.path.isfile(model_name):
+        st = os.stat(model_name)
+        source += [os.path.abspath(model_name), st.st_size, st.st_mtime_ns]
+    digest = hashlib.blake2b(json.dumps(source).encode('utf-8'), digest_size=8).hexdigest()
+    return _app_data_dir('models', f"{Path(model_name).stem}-int8-{digest}.pt")
+
+def _quantize_model(model):
+    """Apply dynamic int8 quantization to every Linear layer of a CPU model."""
+    import torch
+    import whisper.model
+    # Whisper's Linear only adds dtype casts for fp16; quantize_dynamic matches exact types
+    for module in model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _load_whisper_model(model_name: str, device: str | None = None, quantize: bool = False):
+    """``whisper.load_model``, optionally returning the cached int8-quantized CPU variant."""
+    import torch
+    import whisper
+    if not quantize:
+        return whisper.load_model(model_name, device=device)
+    if device not in (None, 'cpu'):
+        logging.info('Quantized models run on the CPU; ignoring device %s', device)
+    path = _quantized_model_path(model_name)
+    if path.exists():
+        try:
+            model = torch.load(path, map_location='cpu', weights_only=False)
+            model.eval()
+            return model
+        except Exception as e:
+            logging.info('Discarding unreadable quantized model %s: %s', path, e)
+    started = time.perf_counter()
+    model = _quantize_model(whisper.load_model(model_name, device='cpu'))
+    model.eval()
+    logging.info('Quantized %s model in %.1fs', model_name, time.perf_counter() - started)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        torch.save(model, tmp)
+        os.replace(tmp, path)
+    except OSError as e:
+        logging.info('Could not cache quantized model: %s', e)
+    return model
+
+# Per-process state of chunk decoding workers (see ParallelChunkDecoder)
+_WORKER_STATE = {}
+
+def _chunk_worker_init(model_name: str, torch_threads: int, quantize: bool = False):
+    import torch
+    torch.set_num_threads(torch_threads)
+    _WORKER_STATE['model'] = _load_whisper_model(model_name, device='cpu', quantize=quantize)
+    logging.debug('Chunk worker %d loaded %s model (%d threads)', os.getpid(), model_name, torch_threads)
+
+def _attach_shared_memory(name: str):
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: spawned workers share the parent's resource tracker, so the
+        # segment stays registered once and is unlinked by the parent only
+        return shared_memory.SharedMemory(name=name)
+
+class _SharedFlag:
+    """Event-like view of a one-byte shared-memory cancellation flag."""
+
+    def __init__(self, shm):
+        self._buf = shm.buf
+
+    def is_set(self) -> bool:
+        return self._buf[0] != 0
+
+def _chunk_worker_audio(audio_ref):
+    """Attach to the shared samples described by ``audio_ref``; reused while the job lasts."""
+    import numpy as np
+    if _WORKER_STATE.get('audio_ref') == audio_ref:
+        return _WORKER_STATE['audio']
+    old_shm = _WORKER_STATE.pop('shm', None)
+    _WORKER_STATE.pop('audio', None)
+    if old_shm is not None:
+        old_shm.close()
+    kind, ref, length = audio_ref
+    if kind == 'shm':
+        shm = _attach_shared_memory(ref)
+        audio = np.ndarray((length,), dtype=np.float32, buffer=shm.buf)
+        _WORKER_STATE['shm'] = shm
+    else:
+        audio = np.load(ref, mmap_mode='r')
+    _WORKER_STATE['audio_ref'] = audio_ref
+    _WORKER_STATE['audio'] = audio
+    return audio
+
+def _chunk_worker_decode(audio_ref, spans, decode_options, cancel_name=None):
+    """Decode the ``(offset, length)`` chunk spans; returns their texts (None on failure) and
+    this worker's drained METRICS. ``cancel_name`` names the one-byte shared flag the parent
+    sets to abandon the decode.
+    """
+    import whisper
+    audio = _chunk_worker_audio(audio_ref)
+    model = _WORKER_STATE['model']
+    cancel_shm = _attach_shared_memory(cancel_name) if cancel_name else None
+    try:
+        stops = [_SharedFlag(cancel_shm)] * len(spans) if cancel_shm is not None else None
+        if stops and stops[0].is_set():
+            return [None] * len(spans), METRICS.drain()
+        with METRICS.timer('mel'):
+            mels = [whisper.log_mel_spectrogram(whisper.pad_or_trim(audio[o:o + n]), model.dims.n_mels) for o, n in spans]
+        try:
+            results = _decode_mel_batch(model, mels, decode_options, stops)
+        except DecodingCancelled:
+            return [None] * len(spans), METRICS.drain()
+        return [r.text.strip() if r is not None else None for r in results], METRICS.drain()
+    finally:
+        if cancel_shm is not None:
+            cancel_shm.close()
+
+class ParallelChunkDecoder:
+    """Pool of worker processes that decode a file's 30 s chunks across CPU cores.
+
+    Each worker loads the model once for the lifetime of the pool. Samples are never pickled:
+    workers map the cached ``.npy`` file directly or attach to a shared-memory copy of the audio.
+    A one-byte shared flag per ``decode`` call lets workers stop mid-chunk when it is cancelled.
+    """
+
+    def __init__(self, model_name: str, workers: int, quantize: bool = False):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        self.model_name = model_name
+        self.workers = workers
+        self.quantize = quantize
+        # Split the cores between workers instead of letting every torch pool claim all of them
+        torch_threads = max(1, (os.cpu_count() or 1) // workers)
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_chunk_worker_init,
+            initargs=(model_name, torch_threads, quantize),
+        )
+
+    def decode(self, audio, spans, decode_options, stop_event, batch_size: int = 1):
+        """Yield ``((offset, length), text)`` for every chunk span, in timestamp order."""
+        import numpy as np
+        from concurrent.futures import TimeoutError as FutureTimeout
+        shm = None
+        if isinstance(audio, np.memmap) and audio.filename and not isinstance(audio.base, np.ndarray):
+            # Whole cached .npy entry: workers map the same file and share the page cache
+            audio_ref = ('npy', audio.filename, len(audio))
+        else:
+            from multiprocessing import shared_memory
+            shm = shared_memory.SharedMemory(create=True, size=max(audio.nbytes, 1))
+            np.ndarray((len(audio),), dtype=np.float32, buffer=shm.buf)[:] = audio
+            audio_ref = ('shm', shm.name, len(audio))
+        from multiprocessing import shared_memory
+        cancel = shared_memory.SharedMemory(create=True, size=1)
+        cancel.buf[0] = 0
+        batches = [spans[k:k + batch_size] for k in range(0, len(spans), batch_size)]
+        futures = [self._executor.submit(_chunk_worker_decode, audio_ref, batch, decode_options, cancel.name)
+                   for batch in batches]
+        try:
+            for batch, future in zip(batches, futures):
+                while True:
+                    if stop_event.is_set():
+                        return
+                    try:
+                        texts, worker_metrics = future.result(timeout=0.1)
+                        METRICS.merge(worker_metrics)
+                        break
+                    except FutureTimeout:
+                        continue
+                    except Exception as e:
+                        logging.error('Worker failed on chunks at %s: %s', batch, e)
+                        texts = [None] * len(batch)
+                        break
+                yield from zip(batch, texts)
+        finally:
+            # Chunks already in a worker stop at their next token; queued ones never start
+            cancel.buf[0] = 1
+            for future in futures:
+                future.cancel()
+            for segment in (shm, cancel):
+                if segment is None:
+                    continue
+                segment.close()
+                try:
+                    segment.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def _model_checkpoint(model_name: str) -> str:
+    """Path of the checkpoint ``whisper.load_model`` reads for ``model_name`` (which may be a path)."""
+    import whisper
+    url = getattr(whisper, '_MODELS', {}).get(model_name)
+    if url is None:
+        return model_name
+    root = os.path.join(os.getenv('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'whisper')
+    return os.path.join(root, os.path.basename(url))
+
+def _model_downloaded(model_name: str) -> bool:
+    """Whether loading ``model_name`` can skip the download (checkpoint paths always can)."""
+    return os.path.isfile(_model_checkpoint(model_name))
+
+def _estimated_model_nbytes(model_name: str, quantize: bool = False) -> int:
+    """Memory ``model_name`` will take once loaded, estimated from its files; 0 when not downloaded.
+    Checkpoints are stored in fp16 and loaded as fp32; the int8 variant is about the fp16 size.
+    """
+    try:
+        if quantize:
+            path = _quantized_model_path(model_name)
+            if path.exists():
+                return path.stat().st_size
+            return os.path.getsize(_model_checkpoint(model_name))
+        return os.path.getsize(_model_checkpoint(model_name)) * 2
+    except OSError:
+        return 0
+
+def _model_nbytes(model) -> int:
+    """Bytes held by a model's weights, including packed int8 weights of quantized layers."""
+    total = 0
+    for value in model.state_dict().values():
+        for tensor in value if isinstance(value, tuple) else (value,):
+            if hasattr(tensor, 'element_size'):
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+class ModelRegistry:
+    """Loaded Whisper models shared by every window, bounded by a memory budget.
+
+    With ``quantize`` every model is loaded as its int8 CPU variant. Models are kept in
+    least-recently-used order; loading one that does not fit drops the oldest until the total
+    is back under ``max_bytes``. The model being returned is never dropped, even when it alone
+    exceeds the budget. Models load outside the registry lock, so a slow load only holds up
+    callers that want the same model.
+    """
+
+    def __init__(self, max_bytes: int, quantize: bool = False):
+        from collections import OrderedDict
+        self.max_bytes = max_bytes
+        self.quantize = quantize
+        self._models = OrderedDict()  # (name, device) -> (model, nbytes)
+        self._sizes = {}  # name -> nbytes seen this session, to make room before loading
+        self._loading = {}  # (name, device) -> Future of a load in progress
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = {}
+        self._warm_cond = threading.Condition()
+        self._warm_wanted = None
+        self._warm_thread = None
+
+    def get(self, model_name: str, device: str | None = None):
+        """Return ``model_name`` on ``device``, loading it on a miss."""
+        from concurrent.futures import Future
+        key = (model_name, device)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                logging.debug('Model cache hit: %s (%s)', model_name, self.summary())
+                return entry[0]
+            loading = self._loading.get(key)
+            owner = loading is None
+            if owner:
+                self.misses += 1
+                loading = self._loading[key] = Future()
+                # Free room first when the size is already known, so old and new never overlap
+                self._evict(self._sizes.get(model_name, 0))
+            else:
+                self.hits += 1
+        if not owner:
+            return loading.result()  # another thread is loading it
+        try:
+            started = time.perf_counter()
+            model = _load_whisper_model(model_name, device=device, quantize=self.quantize)
+            elapsed = time.perf_counter() - started
+            nbytes = _model_nbytes(model)
+            with self._lock:
+                self.load_seconds[model_name] = elapsed
+                self._sizes[model_name] = nbytes
+                self._evict(nbytes)
+                self._models[key] = (model, nbytes)
+                logging.info('Loaded %s model in %.1fs, %.0f MB (%s)',
+                             model_name, elapsed, nbytes / 1024 / 1024, self.summary())
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            loading.set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[key]
+        loading.set_result(model)
+        return model
+
+    def is_loaded(self, model_name: str, device: str | None = None) -> bool:
+        with self._lock:
+            return (model_name, device) in self._models
+
+    def warm_up(self, model_name: str, delay: float = 0.5):
+        """Load ``model_name`` on a background thread so the next ``get`` is a hit.
+
+        Requests are debounced and a newer one replaces any still pending, so scrolling
+        through the model list only loads where it settles. Models that are not downloaded
+        yet, or that do not fit the budget next to the models already loaded (sizes are
+        estimated from the checkpoint before the first load), are not warmed up.
+        """
+        with self._warm_cond:
+            self._warm_wanted = model_name
+            self._warm_cond.notify()
+            if self._warm_thread is None:
+                self._warm_thread = threading.Thread(target=self._warm_loop, args=(delay,),
+                                                     name='model-warm-up', daemon=True)
+                self._warm_thread.start()
+
+    def cancel_warm_up(self):
+        """Drop a pending warm-up; a load that already started still completes and is cached."""
+        with self._warm_cond:
+            self._warm_wanted = None
+
+    def _warm_loop(self, delay: float):
+        while True:
+            with self._warm_cond:
+                while self._warm_wanted is None:
+                    self._warm_cond.wait()
+                model_name = self._warm_wanted
+            time.sleep(delay)
+            with self._warm_cond:
+                if self._warm_wanted != model_name:
+                    continue
+                self._warm_wanted = None
+            if self.is_loaded(model_name):
+                continue
+            try:
+                if not _model_downloaded(model_name):
+                    logging.info('Not warming up %s: the model has not been downloaded yet', model_name)
+                    continue
+                # A warm-up only uses free budget; it never unloads a model that may be in use
+                nbytes = self._sizes.get(model_name) or _estimated_model_nbytes(model_name, self.quantize)
+                with self._lock:
+                    fits = self.resident_bytes() + nbytes <= self.max_bytes
+                if not fits:
+                    logging.info('Not warming up %s: %.0f MB does not fit the model memory budget (%s)',
+                                 model_name, nbytes / 1024 / 1024, self.summary())
+                    continue
+                self.get(model_name)
+            except Exception as e:
+                logging.info('Warm-up of %s failed: %s', model_name, e)
+
+    def _evict(self, incoming: int):
+        while self._models and self.resident_bytes() + incoming > self.max_bytes:
+            (name, device), _ = self._models.popitem(last=False)
+            self.evictions += 1
+            logging.info('Unloaded %s model to stay within the model memory budget', name)
+        gc.collect()
+        self._empty_device_cache()
+
+    @staticmethod
+    def _empty_device_cache():
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+    def resident_bytes(self) -> int:
+        return sum(nbytes for _, nbytes in self._models.values())
+
+    def loaded(self) -> list:
+        with self._lock:
+            return [name for name, _ in self._models]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'loaded': [name for name, _ in self._models],
+                'resident_mb': self.resident_bytes() / 1024 / 1024,
+                'load_seconds': dict(self.load_seconds),
+            }
+
+    def summary(self) -> str:
+        return (f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions, "
+                f"{self.resident_bytes() / 1024 / 1024:.0f}/{self.max_bytes / 1024 / 1024:.0f} MB resident")
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+        gc.collect()
+        self._empty_device_cache()
+
+_NEVER_SET = threading.Event()
+
+class BatchingDecoder:
+    """Runs every call into one model on a single thread, batching chunks from concurrent jobs.
+
+    Whisper models are not safe to share between threads (decoding installs forward hooks on
+    shared modules), so concurrent transcriptions submit their chunk mels here instead. Requests
+    that arrive within ``linger`` seconds of each other and use the same decoding options are
+    decoded in one pass of up to ``max_batch`` chunks, so many short files fill batches together.
+    Each chunk carries its job's stop event: a cancelled chunk ends at its next token and its
+    caller is released right away, while the rest of its batch carries on.
+    """
+
+    def __init__(self, model, max_batch: int = 8, linger: float = 0.005):
+        self.model = model
+        self.max_batch = max(1, max_batch)
+        self.linger = linger
+        self._requests = queue.Queue()
+        METRICS.watch_queue('model-inference', self._requests)
+        self._thread = threading.Thread(target=self._run, name='model-inference', daemon=True)
+        self._thread.start()
+
+    def _submit(self, kind: str, mel, decode_options=None, stop_event=None):
+        from concurrent.futures import Future
+        future = Future()
+        self._requests.put((kind, mel, decode_options, stop_event or _NEVER_SET, future))
+        return future
+
+    def decode(self, mels, decode_options, stop_event=None) -> list:
+        """Decode chunk mels; blocks until all results are in, which keep input order.
+        Raises DecodingCancelled when ``stop_event`` is set before they are.
+        """
+        futures = [self._submit('decode', mel, decode_options, stop_event) for mel in mels]
+        results = [future.result() for future in futures]
+        if stop_event is not None and stop_event.is_set():
+            raise DecodingCancelled()  # results may have been cut short
+        return results
+
+    def detect_language(self, mel):
+        """``(language tokens, probabilities)`` as returned by ``model.detect_language``."""
+        return self._submit('detect', mel).result()
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.max_batch:
+            try:
+                item = self._requests.get(timeout=max(deadline - time.monotonic(), 0.0005))
+            except queue.Empty:
+                break
+            if item is None:
+                self._requests.put(None)  # stop after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                break
+            groups = {}
+            for request in self._collect(item):
+                kind, _, decode_options, _, _ = request
+                groups.setdefault((kind, repr(decode_options)), []).append(request)
+            for (kind, _), requests in groups.items():
+                try:
+                    if kind == 'detect':
+                        for _, mel, _, _, future in requests:
+                            future.set_result(self.model.detect_language(mel))
+                    else:
+                        def release(index):
+                            future = requests[index][4]
+                            if not future.done():
+                                future.set_exception(DecodingCancelled())
+
+                        results = _decode_mel_batch(self.model, [mel for _, mel, _, _, _ in requests], requests[0][2],
+                                                    [stop for _, _, _, stop, _ in requests], release)
+                        for (_, _, _, _, future), result in zip(requests, results):
+                            if not future.done():
+                                future.set_result(result)
+                except Exception as e:
+                    for _, _, _, _, future in requests:
+                        if not future.done():
+                            future.set_exception(e)
+
+    def close(self):
+        METRICS.unwatch_queue(self._requests)
+        self._requests.put(None)
+
+class SharedFeatures:
+    """Decoded audio and whole-file spectrograms of one file, computed once for every pass over it.
+
+    A draft pass and its refine pass both transcribe the file with a SharedFeatures: whichever
+    gets there first decodes the audio (and computes the mel for its ``n_mels``) and the other
+    reuses it.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._audio = None
+        self._mels = {}
+        self._lock = threading.Lock()
+
+    def audio(self):
+        with self._lock:
+            if self._audio is None:
+                self._audio = _safe_load_audio(self.file_path)
+            return self._audio
+
+    def mel(self, n_mels: int):
+        audio = self.audio()
+        with self._lock:
+            if n_mels not in self._mels:
+                self._mels[n_mels] = _log_mel_spectrogram(audio, n_mels, pad_samples=CHUNK_SAMPLES)
+            return self._mels[n_mels]
+
+def transcribe_file(model, model_name: str, file_path: str, language: str | None = None, task: str = 'transcribe',
+                    stop_event=None, audio=None, parallel_decoder=None, runner=None,
+                    on_status=None, on_segments=None, on_progress=None, keep_segments: bool = True,
+                    features: SharedFeatures | None = None, draft: bool = False) -> dict:
+    """Transcribe ``file_path`` in 30 s chunks through the configured decode pipeline.
+
+    ``audio`` may hold already decoded samples; passes over the same file can instead share its
+    audio and spectrogram through ``features`` (unless it is being streamed).
+    ``parallel_decoder(model_name)`` returns the ParallelChunkDecoder used when ``--workers`` is
+    set; without it chunks decode in-process, through ``runner`` (a BatchingDecoder for
+    ``model``) when other jobs share the model.
+    Newly decoded segments are passed to ``on_segments`` as each chunk finishes, while
+    ``on_progress(fraction, message)`` and ``on_status(message)`` report progress. Callers that
+    stream segments elsewhere (see transcriber_export) pass ``keep_segments=False`` so the
+    transcript is not also accumulated here; 'text' and 'segments' then come back empty.
+    With ``--resume`` the chunks finished by an earlier, interrupted run of the same job are
+    replayed from its TranscriptJournal and decoding continues after them. A ``draft`` pass is
+    neither journaled nor counted as a job in the metrics, since it is stopped once the file is
+    refined.
+    Returns ``{'text', 'segments', 'segment_count', 'language', 'metrics'}``, where ``metrics``
+    is the job's PipelineMetrics summary.
+    """
+    import whisper
+    
+    job_metrics = METRICS.job_started()
+    stop_event = stop_event or threading.Event()
+    on_status = on_status or (lambda message: None)
+    on_segments = on_segments or (lambda segments: None)
+    on_progress = on_progress or (lambda fraction, message: None)
+    
+    n_mels = model.dims.n_mels
+    workers = APP_OPTIONS['workers'] > 0 and parallel_decoder is not None
+    if audio is not None:
+        cached_audio = audio
+        features = None
+    else:
+        cached_audio = _cached_audio(file_path) if APP_OPTIONS['streaming'] else None
+        if features is not None and (cached_audio is not None or not APP_OPTIONS['streaming']):
+            cached_audio = features.audio()
+        else:
+            features = None  # streamed passes read their own windows
+    if APP_OPTIONS['streaming'] and cached_audio is None:
+        # Stream 30 s windows off ffmpeg; only the probed duration is known up front
+        total_samples = int((_probe_duration(file_path) or 0) * SAMPLE_RATE)
+        window_iter = _iter_audio_windows(file_path)
+        first_window = next(window_iter, None)
+        if first_window is None:
+            raise RuntimeError("No audio could be decoded from the file")
+        windows = contiguous_windows = itertools.chain([first_window], window_iter)
+        if APP_OPTIONS['vad']:
+            # Noise floor is tracked over the last ~10 minutes of streamed audio
+            windows = _iter_speech_windows(windows, SpeechDetector(history_frames=20000))
+        audio = chunk_spans = None
+        use_file_mel = False
+        # Streamed windows are mel'd one block at a time; the first one is reused below
+        with METRICS.timer('mel'):
+            first_mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(first_window[1]), n_mels)
+        mel_sample = first_mel
+    else:
+        # Load and prepare audio (don't trim the full audio yet); a cached memmap
+        # keeps streaming mode's flat memory profile since pages come from disk
+        audio = cached_audio if cached_audio is not None else _safe_load_audio(file_path)
+        total_samples = len(audio)
+        if APP_OPTIONS['vad']:
+            # Only speech regions are packed into chunks; silent spans never get decoded
+            with METRICS.timer('vad'):
+                speech_regions = SpeechDetector().regions(audio)
+            chunk_spans = _speech_chunks(speech_regions, total_samples)
+            speech = sum(n for _, n in chunk_spans)
+            on_status(f"Voice activity: skipping {100 - 100 * speech / max(total_samples, 1):.0f}% silence")
+        else:
+            speech_regions = [(0, total_samples)]
+            chunk_spans = _fixed_chunks(total_samples)
+        window_iter = windows = _iter_array_windows(audio, chunk_spans)
+        first_window = first_mel = None
+        # One blockwise STFT over the whole file; chunks below are zero-copy slices.
+        # Worker processes compute their own chunk mels, so skip it for them.
+        use_file_mel = APP_OPTIONS['boundary_chunking'] or not workers
+    original_duration = total_samples / SAMPLE_RATE  # Duration in seconds
+    
+    file_mel_state = []
+    
+    def file_mel():
+        # Computed on first use, so fully cached re-runs never need it
+        if not file_mel_state:
+            on_status("Computing spectrogram...")
+            with METRICS.timer('mel'):
+                if features is not None:
+                    file_mel_state.append(features.mel(n_mels))
+                else:
+                    file_mel_state.append(_log_mel_spectrogram(audio, n_mels, pad_samples=CHUNK_SAMPLES))
+        return file_mel_state[0]
+    
+    def mel_for(i, chunk):
+        if audio is not None and use_file_mel:
+            return _mel_window(*file_mel(), i, len(chunk))
+        if first_window is not None and i == 0 and len(chunk) == len(first_window[1]):
+            return first_mel
+        with METRICS.timer('mel'):
+            return whisper.log_mel_spectrogram(whisper.pad_or_trim(chunk), n_mels)
+    
+    # Chunk results are cached by audio content, span, model and decoding options
+    result_cache = _transcript_cache()
+    resume = APP_OPTIONS['resume'] and not draft
+    audio_key = _file_content_key(file_path) if result_cache is not None or resume else None
+    mel_mode = 'file' if audio is not None and use_file_mel else 'window'
+    model_key = f"{model_name}-int8" if APP_OPTIONS['quantize'] else model_name
+    
+    # Detect the spoken language if not specified
+    if language is None:
+        language_key = TranscriptCache.key(audio_key, model_key, 'language') if result_cache is not None else None
+        cached_language = result_cache.get(language_key) if language_key else None
+        if cached_language:
+            detected_language = cached_language
+        else:
+            # Detect language using first 30 seconds
+            if audio is not None:
+                mel_sample = mel_for(0, audio[:CHUNK_SAMPLES])
+            if runner is not None:
+                _, probs = runner.detect_language(mel_sample.to(model.device))
+            else:
+                _, probs = model.detect_language(mel_sample.to(model.device))
+            detected_language = max(probs, key=probs.get)
+            if language_key:
+                result_cache.put(language_key, detected_language)
+        language = detected_language
+        on_status(f"Detected language: {detected_language} (Duration: {original_duration:.1f}s)")
+    
+    # Set up decoding options
+    decode_options = whisper.DecodingOptions(
+        language=language,
+        task=task,
+        fp16=False  # Use FP32 for better compatibility
+    )
+    
+    # Process audio in chunks for real-time results
+    segments = []
+    segment_count = 0
+    last_end = 0.0
+    sample_rate = SAMPLE_RATE
+    chunk_samples = CHUNK_SAMPLES  # 30-second chunks
+    
+    if chunk_spans is not None:
+        total_chunks = len(chunk_spans)
+    else:
+        total_chunks = (total_samples + chunk_samples - 1) // chunk_samples or "?"
+    chunks_done = 0
+    
+    on_status(f"Processing {total_chunks} chunks...")
+    
+    batch_size = max(1, APP_OPTIONS['batch_size'])
+    pending = []  # (offset, chunk, mel, cached) waiting for the next batched pass
+    
+    def chunk_key(i, n):
+        return TranscriptCache.key(audio_key, model_key, repr(decode_options), mel_mode, 'chunk', i, n)
+    
+    def cached_chunk(i, n):
+        return result_cache.get(chunk_key(i, n)) if result_cache is not None else None
+    
+    def store_chunk(i, n, text):
+        if result_cache is not None and text is not None:
+            result_cache.put(chunk_key(i, n), {'text': text})
+    
+    # Finished chunks are journaled; an earlier interrupted run of this exact job is picked up
+    journal = None
+    resume_from = 0
+    if resume:
+        TranscriptJournal.prune()
+        journal = TranscriptJournal(TranscriptCache.key(
+            audio_key, model_key, repr(decode_options), mel_mode, APP_OPTIONS['streaming'], APP_OPTIONS['vad'],
+            APP_OPTIONS['boundary_chunking']))
+        resume_from, resumed_segments = journal.load()
+    
+    def emit_segments(chunk_segments, position, record=True):
+        """Publish ``(start, end, text)`` segments of one decoded window"""
+        nonlocal chunks_done, segment_count, last_end
+        if record and journal is not None:
+            journal.append(position, chunk_segments)
+        chunks_done += 1
+        chunk_num = chunks_done
+        if chunk_segments:
+            new_segments = [{'start': start_time, 'end': end_time, 'text': text}
+                            for start_time, end_time, text in chunk_segments]
+            segment_count += len(new_segments)
+            last_end = new_segments[-1]['end']
+            if keep_segments:
+                segments.extend(new_segments)
+            
+            # Send partial result immediately
+            on_segments(new_segments)
+        
+        # Update progress
+        progress = min(position / total_samples, 1.0) if total_samples else 0.0
+        on_progress(progress, f"Processing chunk {chunk_num}/{total_chunks}...")
+    
+    def emit_chunk(i, length, text):
+        # Calculate timing for this chunk
+        chunk_segments = [(i / sample_rate, (i + length) / sample_rate, text)] if text else []
+        emit_segments(chunk_segments, i + length)
+    
+    def decode_pending():
+        if not pending:
+            return
+        misses = [mel for _, _, mel, hit in pending if hit is None]
+        try:
+            if runner is not None:
+                results = iter(runner.decode(misses, decode_options, stop_event))
+            else:
+                results = iter(_decode_mel_batch(model, misses, decode_options, [stop_event] * len(misses))
+                               if misses else [])
+        except DecodingCancelled:
+            raise
+        except Exception as chunk_error:
+            print(f"Error processing chunk {pending[0][0]//chunk_samples + 1}: {chunk_error}")
+            results = iter([None] * len(misses))
+        # Results arrive in chunk order, so segments and progress stay ordered
+        for i, chunk, _, hit in pending:
+            if hit is not None:
+                emit_chunk(i, len(chunk), hit['text'])
+                continue
+            if stop_event.is_set():
+                raise DecodingCancelled()  # cut-short results are never cached or shown
+            result = next(results)
+            text = result.text.strip() if result is not None else None
+            store_chunk(i, len(chunk), text)
+            emit_chunk(i, len(chunk), text)
+        pending.clear()
+    
+    if resume_from:
+        on_status(f"Resuming at {str(timedelta(seconds=int(resume_from / sample_rate)))} "
+                  f"({len(resumed_segments)} segments restored)")
+        emit_segments(resumed_segments, resume_from, record=False)
+        if chunk_spans is not None:
+            chunk_spans = [(i, n) for i, n in chunk_spans if i + n > resume_from]
+        # Streamed windows still have to be read from the start, but finished ones are not decoded
+        windows = ((i, chunk) for i, chunk in windows if i + len(chunk) > resume_from)
+    
+    completed = False
+    try:
+        if APP_OPTIONS['boundary_chunking']:
+            # Sequential seek loop: each window starts where the last complete segment ended
+            if APP_OPTIONS['batch_size'] > 1 or APP_OPTIONS['workers'] > 0:
+                logging.info('Boundary chunking decodes windows one at a time; batching and workers are not used')
+            if audio is not None:
+                read = lambda start, n: audio[start:start + n]
+                # With VAD, the seek loop runs over each speech region
+                regions = speech_regions
+            else:
+                read = _StreamReader(_prefetch(contiguous_windows, APP_OPTIONS['pipeline_depth'],
+                                               stop_event, 'audio-decode'))
+                regions = [(0, None)]
+                if APP_OPTIONS['vad']:
+                    logging.info('Boundary chunking needs contiguous audio; VAD is not applied while streaming')
+            for region_start, region_end in regions:
+                if region_end is not None and region_end <= resume_from:
+                    continue
+                for window_segments, position in _iter_boundary_windows(
+                        model, read, decode_options, stop_event, max(region_start, resume_from), region_end,
+                        mel_for=mel_for if mel_mode == 'file' else None,
+                        cache=result_cache if audio_key else None,
+                        cache_key=lambda seek, end: TranscriptCache.key(
+                            audio_key, model_key, repr(decode_options), mel_mode, 'boundary', seek, end),
+                        runner=runner):
+                    emit_segments(window_segments, position)
+        elif workers and audio is not None:
+            # Fan chunks out to worker processes; they come back in timestamp order
+            spans = [(i, n) for i, n in chunk_spans if n >= sample_rate]
+            lookups = [(span, cached_chunk(*span)) for span in spans]
+            misses = [span for span, hit in lookups if hit is None]
+            decoder = parallel_decoder(model_name)
+            on_status(f"Decoding {len(misses)} of {len(spans)} chunks on {decoder.workers} worker processes...")
+            decoded = decoder.decode(audio, misses, decode_options, stop_event, batch_size)
+            with contextlib.closing(decoded):
+                for (i, n), hit in lookups:
+                    if hit is not None:
+                        emit_chunk(i, n, hit['text'])
+                        continue
+                    done = next(decoded, None)
+                    if done is None:
+                        break  # stopped
+                    store_chunk(i, n, done[1])
+                    emit_chunk(i, n, done[1])
+        else:
+            if workers:
+                logging.info('Worker processes need the whole file; streaming mode decodes in-process')
+            
+            def prepare_chunks(source):
+                for i, chunk in source:
+                    # Skip very short chunks (less than 1 second)
+                    if len(chunk) < sample_rate:
+                        continue
+                    # Cached chunks skip mel and inference entirely
+                    hit = cached_chunk(i, len(chunk))
+                    if hit is not None:
+                        yield i, chunk, None, hit
+                        continue
+                    # Mel for the chunk, padded to Whisper's expected length (30 seconds)
+                    yield i, chunk, mel_for(i, chunk).to(model.device), None
+            
+            # Staged pipeline: ffmpeg decode -> mel -> inference. While one batch is in
+            # the model the next is already being prepared; queues bound the lookahead.
+            depth = APP_OPTIONS['pipeline_depth']
+            source = _prefetch(windows, depth, stop_event, 'audio-decode') if audio is None else windows
+            prepared = _prefetch(prepare_chunks(source), max(depth, batch_size) if depth > 0 else 0, stop_event, 'mel')
+            with contextlib.closing(prepared):
+                for i, chunk, chunk_mel, hit in prepared:
+                    if stop_event.is_set():
+                        break
+                    if hit is not None and not pending:
+                        emit_chunk(i, len(chunk), hit['text'])
+                        continue
+                    pending.append((i, chunk, chunk_mel, hit))
+                    
+                    # Decode once a full batch of uncached chunks is ready
+                    if sum(1 for p in pending if p[3] is None) >= batch_size:
+                        decode_pending()
+            
+            if not stop_event.is_set():
+                decode_pending()
+        completed = not stop_event.is_set()
+    except DecodingCancelled:
+        pass  # stop_event is set; the segments decoded so far are returned
+    finally:
+        # Kept for --resume unless the whole file was transcribed
+        if journal is not None:
+            if completed:
+                journal.discard()
+            else:
+                journal.close()
+        # Closing the generator stops a streaming ffmpeg decode if we broke out early;
+        # when a pipeline thread owns it, that thread closes it instead
+        if hasattr(window_iter, 'close'):
+            try:
+                window_iter.close()
+            except ValueError:
+                pass
+    
+    # Streamed files may be longer or shorter than probed; count what was actually covered
+    if total_samples:
+        audio_seconds = original_duration
+    else:
+        audio_seconds = last_end
+    if draft:
+        metrics = METRICS.summarize(job_metrics, audio_seconds)
+    else:
+        metrics = METRICS.job_finished(job_metrics, audio_seconds, 'cancelled' if stop_event.is_set() else 'done')
+    logging.info('Job metrics for %s: %s', file_path, json.dumps(metrics))
+    
+    # Return final result
+    return {
+        'text': ' '.join(segment['text'] for segment in segments),
+        'segments': segments,
+        'segment_count': segment_count,
+        'language': language,
+        'metrics': metrics,
+    }
+    
+
+class TranscriptionJob:
+    """One file in a JobScheduler queue. Its fields are updated from scheduler threads."""
+
+    def __init__(self, file_path: str, model_name: str, language: str | None = None, task: str = 'transcribe',
+                 draft_model: str | None = None):
+        self.file_path = file_path
+        self.model_name = model_name
+        # A faster model whose draft_segments cover the file ahead of the refined segments
+        self.draft_model = draft_model
+        self.language = language
+        self.task = task
+        self.state = 'queued'  # queued, running, done, failed, cancelled
+        self.progress = 0.0
+        self.status = 'Queued'
+        self.segments = []
+        self.draft_segments = []
+        self.result = None
+        self.error = None
+        self.elapsed = 0.0
+        self.exported = []
+        self.stop_event = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ('done', 'failed', 'cancelled')
+
+    def cancel(self):
+        self.stop_event.set()
+
+class JobScheduler:
+    """Runs queued TranscriptionJobs on ``concurrency`` threads against one shared model.
+
+    Audio decoding, spectrograms and caching run in parallel per job, while every model call
+    goes through one BatchingDecoder per model, so chunks of different files share batches.
+    ``on_update(job, change)`` is called from scheduler threads with ``change`` one of
+    'state', 'status', 'progress', 'segments' or 'draft'.
+    Jobs with a ``draft_model`` get a second, faster pass that fills ``job.draft_segments``
+    ahead of the refined ``job.segments``; both passes share the file's audio and mel.
+    ``exporter(job)`` may return a TranscriptExport that segments are streamed to as they are
+    decoded; its files are put in place when the job is done and ``job.exported`` lists them.
+    ``parallel_decoder(model_name)`` creates a model's ParallelChunkDecoder (--workers); like the
+    BatchingDecoders, there is one per model and it is closed only once no running job uses it.
+    """
+
+    def __init__(self, load_model, concurrency: int = 2, parallel_decoder=None, on_update=None, max_batch: int = 8,
+                 exporter=None):
+        self.load_model = load_model
+        self.exporter = exporter
+        self.concurrency = max(1, concurrency)
+        self.parallel_decoder = parallel_decoder
+        self.on_update = on_update or (lambda job, change: None)
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        METRICS.watch_queue('jobs', self._queue)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._runners = {}  # model name -> BatchingDecoder
+        self._pools = {}  # model name -> ParallelChunkDecoder
+        self._active = {}  # model name -> running jobs using it
+        self._jobs = set()  # submitted and not finished
+
+    def submit(self, job: TranscriptionJob):
+        with self._lock:
+            self._jobs.add(job)
+            self._queue.put(job)
+            while len(self._threads) < self.concurrency:
+                thread = threading.Thread(target=self._work, name=f'transcription-job-{len(self._threads) + 1}', daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def _runner(self, model_name: str) -> BatchingDecoder:
+        with self._lock:
+            # Runners pin their model; drop idle ones so the registry can unload those models
+            for name in [name for name in self._runners if name != model_name and not self._active.get(name)]:
+                self._runners.pop(name).close()
+            for name in [name for name in self._pools if name != model_name and not self._active.get(name)]:
+                self._pools.pop(name).close()
+            self._active[model_name] = self._active.get(model_name, 0) + 1
+            runner = self._runners.get(model_name)
+            if runner is not None:
+                return runner
+        try:
+            model = self.load_model(model_name)
+        except BaseException:
+            with self._lock:
+                self._active[model_name] -= 1
+            raise
+        with self._lock:
+            # Another job may have loaded the same model meanwhile
+            runner = self._runners.get(model_name)
+            if runner is None:
+                runner = self._runners[model_name] = BatchingDecoder(model, self.max_batch)
+            return runner
+
+    def _pool(self, model_name: str):
+        """Worker pool of ``model_name``, created on first use; held open by the job's _runner count."""
+        with self._lock:
+            pool = self._pools.get(model_name)
+            if pool is None:
+                pool = self._pools[model_name] = self.parallel_decoder(model_name)
+            return pool
+
+    def _release(self, model_name: str):
+        with self._lock:
+            self._active[model_name] -= 1
+
+    def _update(self, job, change, **fields):
+        for name, value in fields.items():
+            setattr(job, name, value)
+        if job.finished:
+            with self._lock:
+                self._jobs.discard(job)
+        try:
+            self.on_update(job, change)
+        except Exception:
+            logging.exception('Job update listener failed')
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            if job.stop_event.is_set():
+                METRICS.count('jobs_cancelled')
+                self._update(job, 'state', state='cancelled', status='Cancelled')
+                continue
+            self._update(job, 'state', state='running', status=f"Loading {job.model_name} model...")
+            started = time.perf_counter()
+            features = draft = None
+            draft_stop = threading.Event()
+            if job.draft_model and job.draft_model != job.model_name:
+                # The draft model is loaded first, so the draft is not held up by the slower model's load
+                features = SharedFeatures(job.file_path)
+                draft_ready = threading.Event()
+                draft = threading.Thread(target=self._draft, args=(job, features, draft_stop, draft_ready),
+                                         name='transcription-draft', daemon=True)
+                draft.start()
+                draft_ready.wait()
+            try:
+                runner = self._runner(job.model_name)
+            except Exception as e:
+                if draft is not None:
+                    draft_stop.set()
+                    draft.join()
+                self._update(job, 'state', state='failed', error=e, status=f"Failed to load model: {e}")
+                continue
+            export = None
+            try:
+                if self.exporter is not None:
+                    export = self.exporter(job)
+
+                def add_segments(segments):
+                    if export is not None:
+                        export.write(segments)
+                    job.segments.extend(segments)
+                    self._update(job, 'segments')
+
+                result = transcribe_file(
+                    runner.model, job.model_name, job.file_path,
+                    language=job.language,
+                    task=job.task,
+                    stop_event=job.stop_event,
+                    parallel_decoder=self._pool if APP_OPTIONS['workers'] > 0 and self.parallel_decoder else None,
+                    runner=runner,
+                    on_status=lambda message: self._update(job, 'status', status=message),
+                    on_segments=add_segments,
+                    on_progress=lambda fraction, message: self._update(job, 'progress', progress=fraction, status=message),
+                    features=features,
+                )
+            except Exception as e:
+                logging.exception('Transcription of %s failed', job.file_path)
+                METRICS.count('jobs_failed')
+                self._update(job, 'state', state='failed', error=e, elapsed=time.perf_counter() - started,
+                             status=f"Failed: {e}")
+                continue
+            finally:
+                self._release(job.model_name)
+                if export is not None:
+                    export.close()
+                # Whatever the draft has not reached yet is not needed any more
+                if draft is not None:
+                    draft_stop.set()
+                    draft.join()
+            elapsed = time.perf_counter() - started
+            if job.stop_event.is_set():
+                self._update(job, 'state', state='cancelled', result=result, elapsed=elapsed, status='Cancelled')
+                continue
+            exported = []
+            if export is not None:
+                try:
+                    exported = export.finish()
+                except OSError as e:
+                    logging.exception('Exporting %s failed', job.file_path)
+                    self._update(job, 'state', state='failed', error=e, elapsed=elapsed, status=f"Export failed: {e}")
+                    continue
+            self._update(job, 'state', state='done', result=result, elapsed=elapsed, progress=1.0,
+                         exported=exported, status=f"Done in {elapsed:.1f}s")
+
+    def _draft(self, job, features, stop, ready):
+        """Transcribe ``job`` with its draft model until ``stop`` is set, filling ``job.draft_segments``."""
+        try:
+            runner = self._runner(job.draft_model)
+        except Exception:
+            logging.exception('Loading draft model %s failed', job.draft_model)
+            return
+        finally:
+            ready.set()
+
+        def add_drafts(segments):
+            job.draft_segments.extend(segments)
+            self._update(job, 'draft')
+
+        try:
+            # In-process only: worker processes hold a copy of the selected model
+            transcribe_file(runner.model, job.draft_model, job.file_path,
+                            language=job.language,
+                            task=job.task,
+                            stop_event=stop,
+                            runner=runner,
+                            on_segments=add_drafts,
+                            keep_segments=False,
+                            features=features,
+                            draft=True)
+        except Exception:
+            logging.exception('Draft transcription of %s failed', job.file_path)
+        finally:
+            self._release(job.draft_model)
+
+    def cancel_all(self):
+        """Cancel running jobs and every job still waiting in the queue."""
+        with self._lock:
+            jobs = list(self._jobs)
+        for job in jobs:
+            job.cancel()  # queued jobs are reported as cancelled when a thread picks them up
+
+    def busy(self) -> bool:
+        with self._lock:
+            return bool(self._jobs)
+
+    def close(self):
+        with self._lock:
+            for _ in self._threads:
+                self._queue.put(None)
+            self._threads = []
+            for runner in self._runners.values():
+                runner.close()
+            self._runners.clear()
+            for pool in self._pools.values():
+                pool.close()
+            self._pools.clear()
@@ -0,0 +1,143 @@
+"""Streaming transcript exporters: each segment is written and flushed as soon as it is decoded.
+
+Exporters take ``{'start', 'end', 'text'}`` segment dicts in decode order and hold no transcript
+in memory, so files of any length can be tailed while they are being transcribed. New formats
+are added to EXPORTERS.
+"""
+import os
+import abc
+import json
+import threading
+from pathlib import Path
+
+
+def _timestamp(seconds: float, separator: str) -> str:
+    ms = int(round(seconds * 1000))
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    secs, ms = divmod(ms, 1000)
+    return f"{hours:02}:{minutes:02}:{secs:02}{separator}{ms:03}"
+
+
+class _TextExporter(abc.ABC):
+    """Base of the exporters: ``format`` turns one segment into the text appended to the file."""
+    suffix = ''
+
+    def __init__(self, path: Path):
+        self._file = open(path, 'w', encoding='utf-8')
+        self.start()
+
+    def start(self):
+        pass
+
+    def write(self, segments):
+        for segment in segments:
+            self._file.write(self.format(segment))
+        self._file.flush()
+
+    @abc.abstractmethod
+    def format(self, segment) -> str:
+        ...
+
+    def close(self):
+        self._file.close()
+
+
+class JsonlWriter(_TextExporter):
+    """One JSON object per segment."""
+    suffix = '.jsonl'
+
+    def format(self, segment) -> str:
+        return json.dumps(segment, ensure_ascii=False) + '\n'
+
+
+class SrtWriter(_TextExporter):
+    """SubRip subtitles, numbered in decode order."""
+    suffix = '.srt'
+
+    def start(self):
+        self._index = 0
+
+    def format(self, segment) -> str:
+        self._index += 1
+        return (f"{self._index}\n{_timestamp(segment['start'], ',')} --> {_timestamp(segment['end'], ',')}\n"
+                f"{segment['text'].strip()}\n\n")
+
+
+class VttWriter(_TextExporter):
+    """WebVTT subtitles."""
+    suffix = '.vtt'
+
+    def start(self):
+        self._file.write("WEBVTT\n\n")
+
+    def format(self, segment) -> str:
+        return (f"{_timestamp(segment['start'], '.')} --> {_timestamp(segment['end'], '.')}\n"
+                f"{segment['text'].strip()}\n\n")
+
+
+EXPORTERS = {'jsonl': JsonlWriter, 'srt': SrtWriter, 'vtt': VttWriter}
+
+
+def parse_formats(spec: str):
+    """``(formats, unknown)`` from a comma-separated list such as ``'jsonl,srt'``."""
+    formats = [name.strip().lower() for name in spec.split(',') if name.strip()]
+    return [name for name in formats if name in EXPORTERS], [name for name in formats if name not in EXPORTERS]
+
+
+class OutputNames:
+    """Export targets for input files, so inputs that share a stem do not share transcript files.
+
+    The first ``talk.wav`` gets ``out/talk``, and a different ``talk.mp3`` gets ``out/talk-2``.
+    The same input always gets the same target again.
+    """
+
+    def __init__(self):
+        self._sources = {}  # target -> input file it was given to
+        self._lock = threading.Lock()
+
+    def target(self, target: Path, source) -> Path:
+        source = os.path.abspath(source)
+        with self._lock:
+            candidate, n = target, 1
+            while self._sources.setdefault(candidate, source) != source:
+                n += 1
+                candidate = target.with_name(f"{target.name}-{n}")
+            return candidate
+
+
+class TranscriptExport:
+    """All exporters of one transcript, written to ``<target><suffix>.part`` while it is decoded.
+
+    ``finish`` renames the files into place once the transcript is complete; ``close`` leaves
+    the partial files, which a resumed run overwrites.
+    """
+
+    def __init__(self, target: Path, formats):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        self.parts = {name: target.with_name(target.name + EXPORTERS[name].suffix + '.part') for name in formats}
+        self._writers = []
+        try:
+            for name, part in self.parts.items():
+                self._writers.append(EXPORTERS[name](part))
+        except BaseException:
+            self.close()
+            raise
+
+    def write(self, segments):
+        for writer in self._writers:
+            writer.write(segments)
+
+    def close(self):
+        for writer in self._writers:
+            writer.close()
+        self._writers = []
+
+    def finish(self) -> list:
+        """Close and move the files into place; returns their final paths."""
+        self.close()
+        paths = []
+        for part in self.parts.values():
+            os.replace(part, part.with_suffix(''))
+            paths.append(part.with_suffix(''))
+        return paths
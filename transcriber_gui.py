@@ -0,0 +1,949 @@
+"""GTK 4 / libadwaita front end; imported only when the graphical app is started."""
+import os
+import threading
+import sys
+import gc
+import signal
+import atexit
+from pathlib import Path
+
+from datetime import timedelta
+import logging
+
+from transcriber_engine import (
+    APP_OPTIONS,
+    AUDIO_EXTENSIONS,
+    DEBUG_MODE,
+    METRICS,
+    STARTUP,
+    JobScheduler,
+    ModelRegistry,
+    ParallelChunkDecoder,
+    TranscriptionJob,
+    _audio_files,
+    _install_exception_hook,
+    _load_settings,
+    _save_settings,
+    preload_modules,
+)
+from transcriber_export import OutputNames, TranscriptExport, parse_formats
+
+# Bootstrap GTK/GI environment for frozen (PyInstaller) builds on Windows
+def _bootstrap_gtk_env():
+    try:
+        base_dir = None
+        if getattr(sys, 'frozen', False):
+            base_dir = getattr(sys, '_MEIPASS', os.path.dirname(sys.executable))
+        else:
+            base_dir = os.path.dirname(os.path.abspath(__file__))
+
+        # Ensure DLL search path includes our bundle
+        if hasattr(os, 'add_dll_directory') and os.name == 'nt':
+            try:
+                os.add_dll_directory(base_dir)
+                bin_dir = os.path.join(base_dir, 'bin')
+                if os.path.isdir(bin_dir):
+                    os.add_dll_directory(bin_dir)
+            except Exception:
+                pass
+        # Prepend our base directory to PATH so helper executables (e.g., ffmpeg.exe) are found
+        try:
+            os.environ['PATH'] = base_dir + os.pathsep + os.environ.get('PATH', '')
+            bin_dir = os.path.join(base_dir, 'bin')
+            if os.path.isdir(bin_dir):
+                os.environ['PATH'] = bin_dir + os.pathsep + os.environ['PATH']
+        except Exception:
+            pass
+
+        # GI typelibs
+        candidates = [
+            os.path.join(base_dir, 'gi_typelibs'),
+            os.path.join(base_dir, 'lib', 'girepository-1.0'),
+            os.path.join(base_dir, 'girepository-1.0'),
+        ]
+        for p in candidates:
+            if os.path.isdir(p):
+                os.environ['GI_TYPELIB_PATH'] = p + os.pathsep + os.environ.get('GI_TYPELIB_PATH', '')
+                break
+
+        # GTK data (themes, schemas)
+        share_dir = os.path.join(base_dir, 'share')
+        if os.path.isdir(share_dir):
+            os.environ['XDG_DATA_DIRS'] = share_dir + os.pathsep + os.environ.get('XDG_DATA_DIRS', '')
+            # Help GTK locate its runtime resources on Windows
+            os.environ.setdefault('GTK_DATA_PREFIX', base_dir)
+            os.environ.setdefault('GTK_EXE_PREFIX', base_dir)
+            schemas_dir = os.path.join(share_dir, 'glib-2.0', 'schemas')
+            if os.path.isdir(schemas_dir):
+                os.environ.setdefault('GSETTINGS_SCHEMA_DIR', schemas_dir)
+        # Prefer GL renderer to avoid black borders with ANGLE on some systems
+        os.environ.setdefault('GSK_RENDERER', 'gl')
+        # Ensure Adwaita theme is selected if available
+        os.environ.setdefault('GTK_THEME', 'Adwaita')
+
+        # GDK pixbuf loaders
+        gdk_loaders_dir = os.path.join(base_dir, 'lib', 'gdk-pixbuf-2.0', '2.10.0', 'loaders')
+        if os.path.isdir(gdk_loaders_dir):
+            os.environ['GDK_PIXBUF_MODULEDIR'] = gdk_loaders_dir
+            cache = os.path.join(base_dir, 'lib', 'gdk-pixbuf-2.0', '2.10.0', 'loaders.cache')
+            if os.path.exists(cache):
+                os.environ['GDK_PIXBUF_MODULE_FILE'] = cache
+    except Exception:
+        pass
+
+_bootstrap_gtk_env()
+
+try:
+    import gi
+    gi.require_version('Gtk', '4.0')
+    gi.require_version('Adw', '1')
+    from gi.repository import Gtk, Gio, GLib, GObject, Adw, Gdk, Pango
+    STARTUP.mark('GTK imported')
+    # Initialize libadwaita so resources/themes are loaded correctly
+    try:
+        Adw.init()
+    except Exception:
+        pass
+    # Route GLib logs to Python logging when debugging
+    if DEBUG_MODE:
+        try:
+            def _glib_handler(domain, level, message, user_data=None):
+                lvl = int(level)
+                if lvl & (GLib.LogLevelFlags.LEVEL_ERROR | GLib.LogLevelFlags.LEVEL_CRITICAL):
+                    logging.error('[%s] %s', domain, message)
+                elif lvl & GLib.LogLevelFlags.LEVEL_WARNING:
+                    logging.warning('[%s] %s', domain, message)
+                elif lvl & GLib.LogLevelFlags.LEVEL_INFO:
+                    logging.info('[%s] %s', domain, message)
+                else:
+                    logging.debug('[%s] %s', domain, message)
+            GLib.log_set_handler(None, GLib.LogLevelFlags.LEVEL_MASK, _glib_handler, None)
+            logging.debug('GLib logging handler installed')
+        except Exception:
+            pass
+except Exception as e:
+    # Provide a visible error on Windows if GTK cannot be initialized
+    if os.name == 'nt':
+        try:
+            import ctypes
+            ctypes.windll.user32.MessageBoxW(None, f"Failed to initialize GTK:\n{e}", "Whisper Transcriber", 0x10)
+        except Exception:
+            pass
+    raise
+
+# Scheduler updates are coalesced into one UI flush per interval (~30 per second)
+UI_FLUSH_INTERVAL_MS = 33
+
+def _format_segment(start, end, text):
+    return f"[{str(timedelta(seconds=int(start)))} --> {str(timedelta(seconds=int(end)))}]  {text}"
+
+def _parse_timestamp(text):
+    """Seconds from ``h:mm:ss``, ``mm:ss`` or plain seconds; None if unparseable"""
+    try:
+        seconds = 0.0
+        for part in text.strip().split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        return None
+
+class SegmentItem(GObject.Object):
+    """One transcript segment in the segment list's Gio.ListStore"""
+    __gtype_name__ = 'WhisperSegmentItem'
+    
+    def __init__(self, start, end, text, draft=False):
+        super().__init__()
+        self.start = start
+        self.end = end
+        self.text = text
+        self.draft = draft
+
+class WhisperTranscriber(Adw.Application):    
+    def __init__(self):
+        super().__init__(application_id='com.example.whispertranscriber')
+        self.connect('activate', self.on_activate)
+        self.window = None
+        self.current_progress = 0.0
+        self.total_duration = 0
+        self.whisper_model = None
+        self._cleanup_registered = False
+        
+        # Loaded models are shared by all windows and bounded by --model-memory-mb
+        self.models = ModelRegistry(APP_OPTIONS['model_memory_mb'] * 1024 * 1024, quantize=APP_OPTIONS['quantize'])
+        
+        # Register cleanup handlers
+        self._register_cleanup_handlers()
+        
+    def on_activate(self, app):
+        self.window = MainWindow(application=app)
+        self.window.present()
+        STARTUP.mark('window presented')
+        # Heavy imports wait until the window has been drawn and the main loop is idle
+        GLib.idle_add(self.window.on_startup_idle, priority=GLib.PRIORITY_LOW)
+    
+    def _register_cleanup_handlers(self):
+        """Register cleanup handlers for graceful shutdown"""
+        if not self._cleanup_registered:
+            atexit.register(self._cleanup_resources)
+            signal.signal(signal.SIGTERM, self._signal_handler)
+            signal.signal(signal.SIGINT, self._signal_handler)
+            self._cleanup_registered = True
+    
+    def _signal_handler(self, signum, frame):
+        """Handle system signals for graceful shutdown"""
+        print(f"Received signal {signum}, cleaning up...")
+        self._cleanup_resources()
+        sys.exit(0)
+    
+    def _cleanup_resources(self):
+        """Clean up resources on application exit"""
+        try:
+            if self.window:
+                self.window.cleanup_resources()
+            
+            # Clean up Whisper model
+            if hasattr(self, 'whisper_model') and self.whisper_model is not None:
+                del self.whisper_model
+                self.whisper_model = None
+            
+            # Unload cached models
+            if hasattr(self, 'models'):
+                logging.info('Model cache: %s', self.models.summary())
+                self.models.clear()
+            
+            # Force garbage collection
+            gc.collect()
+            
+        except Exception as e:
+            print(f"Error during cleanup: {e}")
+
+class MainWindow(Adw.ApplicationWindow):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.set_title("Whisper Transcriber")
+        self.set_default_size(800, 600)
+        self.set_resizable(True)
+        
+        # Connect close request signal to handle cleanup
+        self.connect("close-request", self.on_close_request)
+        
+        # Initialize resource management
+        self.whisper_model = None
+        self.models = self.get_application().models
+        
+        # Queued files run on a scheduler that shares one loaded model between --jobs threads
+        self.jobs = []
+        self.job_rows = {}
+        self.job_texts = {}
+        self.scheduler = JobScheduler(
+            load_model=self._load_model_safely,
+            concurrency=APP_OPTIONS['jobs'],
+            parallel_decoder=self._parallel_decoder,
+            on_update=self.queue_job_update,
+            max_batch=max(APP_OPTIONS['batch_size'], APP_OPTIONS['jobs']),
+            exporter=self._job_export if APP_OPTIONS['output_dir'] else None,
+        )
+        self._run_started = None
+        self._first_job_reported = False
+        # Export targets handed out to queued files (--output-dir), unique per input file
+        self._output_names = OutputNames()
+        
+        # Scheduler updates are merged and applied at most once per frame
+        self._update_lock = threading.Lock()
+        self._dirty_jobs = set()
+        self._flush_scheduled = False
+        self._shown_job = None
+        self._shown_count = 0  # formatted segments of the shown job already in the text buffer
+        self._shown_drafts = (0, 0)  # range of the shown job's draft_segments after them
+        
+        # Create main container with headerbar
+        main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
+        
+        # Create headerbar with native close button
+        self.headerbar = Adw.HeaderBar()
+        self.headerbar.set_title_widget(Adw.WindowTitle(title="Whisper Transcriber"))
+        main_box.append(self.headerbar)
+        
+        # Main content layout
+        self.box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=12)
+        self.box.set_margin_top(12)
+        self.box.set_margin_bottom(12)
+        self.box.set_margin_start(12)
+        self.box.set_margin_end(12)
+        main_box.append(self.box)
+        
+        self.set_content(main_box)
+        
+        # File selection
+        self.file_chooser_button = Gtk.Button(label="Add Audio Files")
+        self.file_chooser_button.connect("clicked", self.on_file_clicked)
+        self.box.append(self.file_chooser_button)
+        
+        # Queue summary label
+        self.file_label = Gtk.Label(label="No files queued (add files or drop them here)")
+        self.file_label.set_halign(Gtk.Align.START)
+        self.box.append(self.file_label)
+        
+        # Job queue: one row per file with its own progress and cancel button
+        self.queue_list = Gtk.ListBox()
+        self.queue_list.set_selection_mode(Gtk.SelectionMode.SINGLE)
+        self.queue_list.connect("row-selected", self.on_job_selected)
+        queue_scrolled = Gtk.ScrolledWindow()
+        queue_scrolled.set_child(self.queue_list)
+        queue_scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        queue_scrolled.set_min_content_height(140)
+        self.box.append(queue_scrolled)
+        
+        # Accept files and folders dropped onto the window
+        drop_target = Gtk.DropTarget.new(Gdk.FileList, Gdk.DragAction.COPY)
+        drop_target.connect("drop", self.on_files_dropped)
+        self.add_controller(drop_target)
+        
+        # Model selection
+        model_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        model_label = Gtk.Label(label="Model:")
+        model_names = ["tiny", "base", "small", "medium", "large"]
+        self.model_combo = Gtk.DropDown.new_from_strings(model_names)
+        last_model = _load_settings().get('model')
+        # Default to 'small' unless another model was used last time
+        self.model_combo.set_selected(model_names.index(last_model) if last_model in model_names else 2)
+        self.model_combo.connect("notify::selected", self.on_model_changed)
+        model_box.append(model_label)
+        model_box.append(self.model_combo)
+        self.box.append(model_box)
+        
+        # Language selection
+        lang_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        lang_label = Gtk.Label(label="Language:")
+        self.lang_combo = Gtk.DropDown.new_from_strings(["Auto-detect", "Arabic", "English", "Spanish", "French", "German"])
+        lang_box.append(lang_label)
+        lang_box.append(self.lang_combo)
+        self.box.append(lang_box)
+        
+        # Progress bar
+        self.progress_bar = Gtk.ProgressBar()
+        self.box.append(self.progress_bar)
+        
+        # Status label
+        self.status_label = Gtk.Label()
+        self.status_label.set_halign(Gtk.Align.START)
+        self.box.append(self.status_label)
+        
+        # Transcription output - using TextView for selectable text
+        self.output_textview = Gtk.TextView()
+        self.output_textview.set_editable(False)
+        self.output_textview.set_cursor_visible(False)
+        self.output_textview.set_wrap_mode(Gtk.WrapMode.WORD)
+        self.output_textview.set_hexpand(True)
+        self.output_textview.set_vexpand(True)
+        
+        # Get the text buffer
+        self.output_buffer = self.output_textview.get_buffer()
+        self.output_buffer.set_text("Transcription will appear here", -1)
+        # Stays at the end of the buffer as text is appended, for auto-scrolling
+        self.output_end_mark = self.output_buffer.create_mark("transcript-end", self.output_buffer.get_end_iter(), False)
+        # Draft text (--draft-model) runs from this mark to the end and is replaced as it is refined
+        self.output_draft_mark = self.output_buffer.create_mark("draft-start", self.output_buffer.get_end_iter(), True)
+        self.output_buffer.create_tag("draft", style=Pango.Style.ITALIC)
+        
+        # Scrolled window for output
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_child(self.output_textview)
+        scrolled.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        
+        # Segment list: a recycling ListView over a Gio.ListStore, so only the rows on
+        # screen are ever materialized, however long the transcript is
+        self.segment_store = Gio.ListStore.new(SegmentItem)
+        self.segment_selection = Gtk.MultiSelection.new(self.segment_store)
+        segment_factory = Gtk.SignalListItemFactory()
+        segment_factory.connect("setup", self.on_segment_setup)
+        segment_factory.connect("bind", self.on_segment_bind)
+        self.segment_view = Gtk.ListView.new(self.segment_selection, segment_factory)
+        copy_shortcuts = Gtk.ShortcutController()
+        copy_shortcuts.add_shortcut(Gtk.Shortcut.new(Gtk.ShortcutTrigger.parse_string("<Control>c"),
+                                                     Gtk.CallbackAction.new(lambda *args: self.copy_selection() or True)))
+        self.segment_view.add_controller(copy_shortcuts)
+        self.segment_scrolled = Gtk.ScrolledWindow()
+        self.segment_scrolled.set_child(self.segment_view)
+        self.segment_scrolled.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        
+        # Text and segment views of the selected job's transcript
+        self.output_stack = Gtk.Stack()
+        self.output_stack.add_titled(scrolled, "text", "Text")
+        self.output_stack.add_titled(self.segment_scrolled, "segments", "Segments")
+        self.output_stack.set_vexpand(True)
+        self.output_stack.connect("notify::visible-child-name", self.on_output_view_changed)
+        
+        view_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        view_switcher = Gtk.StackSwitcher()
+        view_switcher.set_stack(self.output_stack)
+        view_switcher.set_hexpand(True)
+        view_switcher.set_halign(Gtk.Align.START)
+        self.jump_entry = Gtk.Entry()
+        self.jump_entry.set_placeholder_text("Jump to 1:23:45")
+        self.jump_entry.set_width_chars(14)
+        self.jump_entry.connect("activate", self.on_jump_activate)
+        copy_button = Gtk.Button(label="Copy")
+        copy_button.set_tooltip_text("Copy the selected segments or text (everything if nothing is selected)")
+        copy_button.connect("clicked", lambda button: self.copy_selection())
+        view_box.append(view_switcher)
+        view_box.append(self.jump_entry)
+        view_box.append(copy_button)
+        self.box.append(view_box)
+        self.box.append(self.output_stack)
+        
+        # Buttons
+        button_box = Gtk.Box(spacing=6)
+        self.transcribe_button = Gtk.Button(label="Transcribe")
+        self.transcribe_button.connect("clicked", self.on_transcribe_clicked)
+        self.transcribe_button.set_sensitive(False)
+        
+        self.stop_button = Gtk.Button(label="Stop")
+        self.stop_button.connect("clicked", self.on_stop_clicked)
+        self.stop_button.set_sensitive(False)
+        
+        button_box.append(self.transcribe_button)
+        button_box.append(self.stop_button)
+        self.box.append(button_box)
+        
+    def on_file_clicked(self, button):
+        dialog = Gtk.FileDialog()
+        dialog.set_title("Add Audio Files")
+        
+        # Create file filter for audio files
+        filter_audio = Gtk.FileFilter()
+        filter_audio.set_name("Audio files")
+        filter_audio.add_mime_type("audio/*")
+        filter_audio.add_pattern("*.mp3")
+        filter_audio.add_pattern("*.wav")
+        filter_audio.add_pattern("*.m4a")
+        filter_audio.add_pattern("*.flac")
+        filter_audio.add_pattern("*.ogg")
+        
+        # Create filter list and add our filter
+        filter_list = Gio.ListStore.new(Gtk.FileFilter)
+        filter_list.append(filter_audio)
+        dialog.set_filters(filter_list)
+
+        # Keep a reference so the dialog is not GC'd before the async callback
+        self._file_dialog = dialog
+        dialog.open_multiple(self, None, self.on_file_dialog_response)
+        
+    def on_file_dialog_response(self, dialog, result):
+        try:
+            files = dialog.open_multiple_finish(result)
+            if files:
+                self.add_files(files.get_item(i).get_path() for i in range(files.get_n_items()))
+        except Exception as e:
+            print(f"File selection cancelled or failed: {e}")
+            pass
+        
+    def on_files_dropped(self, drop_target, value, x, y):
+        self.add_files(f.get_path() for f in value.get_files() if f.get_path())
+        return True
+        
+    def add_files(self, paths):
+        """Queue audio files; folders are searched for audio files"""
+        added = 0
+        for path in paths:
+            for file_path in _audio_files(path):
+                job = TranscriptionJob(str(file_path), model_name=None)
+                self.jobs.append(job)
+                self.job_texts[job] = []
+                self.queue_list.append(self._create_job_row(job))
+                added += 1
+        if added:
+            self.transcribe_button.set_sensitive(True)
+            self.update_status(f"Added {added} file{'s' if added != 1 else ''}")
+        else:
+            self.update_status(f"No audio files found ({', '.join(sorted(AUDIO_EXTENSIONS))})")
+        self.update_queue_summary()
+        
+    def _create_job_row(self, job):
+        row_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        row_box.set_margin_top(3)
+        row_box.set_margin_bottom(3)
+        row_box.set_margin_start(6)
+        row_box.set_margin_end(6)
+        
+        name_label = Gtk.Label(label=os.path.basename(job.file_path))
+        name_label.set_halign(Gtk.Align.START)
+        name_label.set_hexpand(True)
+        name_label.set_ellipsize(Pango.EllipsizeMode.MIDDLE)
+        name_label.set_tooltip_text(job.file_path)
+        
+        status_label = Gtk.Label(label=job.status)
+        status_label.set_width_chars(28)
+        status_label.set_max_width_chars(28)
+        status_label.set_xalign(0)
+        status_label.set_ellipsize(Pango.EllipsizeMode.END)
+        
+        progress_bar = Gtk.ProgressBar()
+        progress_bar.set_valign(Gtk.Align.CENTER)
+        progress_bar.set_size_request(120, -1)
+        
+        cancel_button = Gtk.Button.new_from_icon_name("window-close-symbolic")
+        cancel_button.set_tooltip_text("Cancel")
+        cancel_button.add_css_class("flat")
+        cancel_button.connect("clicked", self.on_job_cancel_clicked, job)
+        
+        row_box.append(name_label)
+        row_box.append(status_label)
+        row_box.append(progress_bar)
+        row_box.append(cancel_button)
+        
+        row = Gtk.ListBoxRow()
+        row.set_child(row_box)
+        row.job = job
+        self.job_rows[job] = (row, status_label, progress_bar, cancel_button)
+        return row
+        
+    def on_job_cancel_clicked(self, button, job):
+        if job.model_name is None:
+            # Not started yet: just drop it from the queue
+            row = self.job_rows.pop(job)[0]
+            self.queue_list.remove(row)
+            self.jobs.remove(job)
+            self.job_texts.pop(job, None)
+            self.transcribe_button.set_sensitive(any(j.model_name is None for j in self.jobs))
+        else:
+            job.cancel()
+            button.set_sensitive(False)
+        self.update_queue_summary()
+        
+    def on_job_selected(self, listbox, row):
+        if row is not None:
+            self.show_job(row.job)
+        
+    def _segment_view_active(self):
+        return self.output_stack.get_visible_child_name() == "segments"
+        
+    @staticmethod
+    def _visible_drafts(job, count):
+        """Range of ``job.draft_segments`` not yet covered by its first ``count`` refined segments"""
+        drafts = job.draft_segments
+        if job.finished:
+            return (len(drafts), len(drafts))
+        refined_until = job.segments[count - 1]['end'] if count else 0.0
+        first = len(drafts)
+        while first > 0 and drafts[first - 1]['start'] >= refined_until:
+            first -= 1
+        return (first, len(drafts))
+        
+    def show_job(self, job):
+        """Render the job's transcript into the active view; the other view is emptied"""
+        texts = self.job_texts.get(job, [])
+        self._shown_job = job
+        self._shown_count = len(texts)
+        self._shown_drafts = self._visible_drafts(job, len(texts))
+        drafts = job.draft_segments[self._shown_drafts[0]:self._shown_drafts[1]]
+        if self._segment_view_active():
+            items = [SegmentItem(seg['start'], seg['end'], seg['text']) for seg in job.segments[:len(texts)]]
+            items += [SegmentItem(seg['start'], seg['end'], seg['text'], draft=True) for seg in drafts]
+            self.segment_store.splice(0, self.segment_store.get_n_items(), items)
+            self.output_buffer.set_text("", -1)
+        elif texts or drafts:
+            self.segment_store.remove_all()
+            self.update_transcription_text("\n\n".join(texts))
+            self.append_draft_text(drafts, separate=bool(texts))
+        else:
+            self.segment_store.remove_all()
+            self.update_transcription_text(job.status if job.state != 'queued' else "Transcription will appear here")
+        
+    def on_output_view_changed(self, stack, _pspec):
+        if self._shown_job is not None:
+            self.show_job(self._shown_job)
+        
+    def on_segment_setup(self, factory, list_item):
+        row_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
+        row_box.set_margin_top(2)
+        row_box.set_margin_bottom(2)
+        time_label = Gtk.Label()
+        time_label.set_valign(Gtk.Align.START)
+        time_label.add_css_class("monospace")
+        time_label.add_css_class("dim-label")
+        text_label = Gtk.Label()
+        text_label.set_xalign(0)
+        text_label.set_hexpand(True)
+        text_label.set_wrap(True)
+        text_label.set_wrap_mode(Pango.WrapMode.WORD_CHAR)
+        row_box.append(time_label)
+        row_box.append(text_label)
+        list_item.set_child(row_box)
+        
+    def on_segment_bind(self, factory, list_item):
+        item = list_item.get_item()
+        time_label = list_item.get_child().get_first_child()
+        time_label.set_text(f"{str(timedelta(seconds=int(item.start)))} – {str(timedelta(seconds=int(item.end)))}")
+        text_label = time_label.get_next_sibling()
+        text_label.set_text(item.text)
+        if item.draft:
+            text_label.add_css_class("dim-label")
+        else:
+            text_label.remove_css_class("dim-label")
+        
+    def on_jump_activate(self, entry):
+        seconds = _parse_timestamp(entry.get_text())
+        job = self._shown_job
+        if seconds is None or job is None or not self._shown_count:
+            self.update_status("Enter a time like 1:23:45, 23:45 or 90")
+            return
+        # Last segment starting at or before the time; segments are in timestamp order
+        segments = job.segments
+        lo, hi = 0, self._shown_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if segments[mid]['start'] <= seconds:
+                lo = mid + 1
+            else:
+                hi = mid
+        position = max(lo - 1, 0)
+        if self._segment_view_active():
+            if hasattr(self.segment_view, 'scroll_to'):
+                self.segment_view.scroll_to(position, Gtk.ListScrollFlags.FOCUS | Gtk.ListScrollFlags.SELECT, None)
+            else:
+                self.segment_selection.select_item(position, True)
+                self.segment_view.activate_action("list.scroll-to-item", GLib.Variant.new_uint32(position))
+        else:
+            # Segments are separated by one blank line in the text view
+            found, line_iter = self.output_buffer.get_iter_at_line(position * 2)
+            if found:
+                self.output_buffer.place_cursor(line_iter)
+                self.output_textview.scroll_to_iter(line_iter, 0.0, True, 0.0, 0.0)
+        
+    def copy_selection(self):
+        """Copy selected segments (segment view) or selected text; everything when nothing is selected"""
+        if self._segment_view_active():
+            selected = self.segment_selection.get_selection()
+            count = selected.get_size()
+            if count:
+                positions = (selected.get_nth(i) for i in range(count))
+            else:
+                positions = range(self.segment_store.get_n_items())
+            items = (self.segment_store.get_item(position) for position in positions)
+            text = "\n".join(_format_segment(item.start, item.end, item.text) for item in items)
+        else:
+            bounds = self.output_buffer.get_selection_bounds()
+            if not bounds:
+                bounds = self.output_buffer.get_bounds()
+            text = self.output_buffer.get_text(bounds[0], bounds[1], False)
+        self.get_clipboard().set_content(Gdk.ContentProvider.new_for_value(text))
+        self.update_status("Copied to clipboard")
+        
+    def on_transcribe_clicked(self, button):
+        pending = [job for job in self.jobs if job.model_name is None]
+        if not pending:
+            self.update_status("No files queued")
+            return
+            
+        self.transcribe_button.set_sensitive(False)
+        self.stop_button.set_sensitive(True)
+        if self.queue_list.get_selected_row() is None:
+            self.queue_list.select_row(self.job_rows[pending[0]][0])
+        
+        # Get selected parameters
+        model = self.model_combo.get_selected_item().get_string()
+        lang = self.lang_combo.get_selected_item().get_string()
+        if lang == "Auto-detect":
+            lang = None
+        lang = lang.lower() if lang else None
+        _save_settings(model=model)
+        # A warm-up already loading this model is waited for by the transcription
+        self.models.cancel_warm_up()
+        
+        STARTUP.mark('first transcription requested')
+        if not self.scheduler.busy():
+            self._run_started = METRICS.job_started()
+        for job in pending:
+            job.model_name = model
+            job.language = lang
+            job.draft_model = APP_OPTIONS['draft_model']
+            self.scheduler.submit(job)
+        self.update_queue_summary()
+        
+    def on_startup_idle(self):
+        """First idle moment after the window is shown: import torch/whisper in the background"""
+        STARTUP.mark('window idle')
+        if APP_OPTIONS['preload']:
+            preload_modules(on_done=lambda: GLib.idle_add(self.on_preloaded))
+        else:
+            self.on_preloaded()
+        return False
+        
+    def on_preloaded(self):
+        STARTUP.mark('ready to transcribe')
+        STARTUP.report('Startup')
+        # The last-used model is loaded only now, so it never competes with the first frame
+        if APP_OPTIONS['warm_up'] and not self.scheduler.busy():
+            self.models.warm_up(self.model_combo.get_selected_item().get_string())
+        return False
+        
+    def on_model_changed(self, combo, _pspec):
+        # Speculatively load the new selection; never while transcriptions hold a model
+        if APP_OPTIONS['warm_up'] and not self.scheduler.busy():
+            self.models.warm_up(combo.get_selected_item().get_string())
+        
+    def on_stop_clicked(self, button):
+        self.stop_button.set_sensitive(False)
+        self.update_status("Stopping...")
+        self.scheduler.cancel_all()
+        
+    def queue_job_update(self, job, change):
+        """Scheduler callback (any thread): mark the job dirty and schedule one flush per frame"""
+        with self._update_lock:
+            self._dirty_jobs.add(job)
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        GLib.timeout_add(UI_FLUSH_INTERVAL_MS, self._flush_job_updates)
+        
+    def _flush_job_updates(self):
+        with self._update_lock:
+            jobs = list(self._dirty_jobs)
+            self._dirty_jobs.clear()
+            self._flush_scheduled = False
+        for job in jobs:
+            self.on_job_update(job)
+        self.update_queue_summary()
+        return False  # one-shot; the next update schedules another flush
+        
+    def on_job_update(self, job):
+        """Reflect a job's latest state in its queue row and, if shown, the transcript (main loop)"""
+        widgets = self.job_rows.get(job)
+        if widgets is None:
+            return
+        row, status_label, progress_bar, cancel_button = widgets
+        texts = self.job_texts[job]
+        for segment in job.segments[len(texts):]:
+            texts.append(_format_segment(segment['start'], segment['end'], segment['text']))
+        status = job.status
+        if job.state == 'failed':
+            status = self._friendly_error(job.error)
+        status_label.set_text(status)
+        status_label.set_tooltip_text("\n".join([status] + [str(path) for path in job.exported]))
+        progress_bar.set_fraction(job.progress)
+        if texts:
+            STARTUP.mark('first segments shown')
+        if job.finished:
+            cancel_button.set_sensitive(False)
+            if not self._first_job_reported:
+                self._first_job_reported = True
+                STARTUP.mark('first transcription finished')
+                STARTUP.report('Startup and first transcription')
+        if self.queue_list.get_selected_row() is row:
+            drafts = self._visible_drafts(job, len(texts))
+            if self._shown_job is not job or (self._shown_count == 0 and (texts or job.finished or
+                                                                          self._shown_drafts[1] == 0 < drafts[1])):
+                self.show_job(job)
+            elif len(texts) > self._shown_count or drafts != self._shown_drafts:
+                # Only the new segments are inserted, in place of the drafts they cover; earlier
+                # text and rows are never re-laid out
+                first, end = self._shown_drafts
+                covered = job.draft_segments[first:max(first, min(drafts[0], end))]
+                new_drafts = job.draft_segments[max(drafts[0], end):drafts[1]]
+                if self._segment_view_active():
+                    self.append_segment_items(job.segments[self._shown_count:len(texts)], new_drafts,
+                                              self._shown_count, len(covered))
+                else:
+                    self.refine_transcription_text(texts[self._shown_count:], covered, new_drafts)
+                self._shown_count = len(texts)
+                self._shown_drafts = drafts
+        
+    def update_queue_summary(self):
+        submitted = [job for job in self.jobs if job.model_name is not None]
+        waiting = len(self.jobs) - len(submitted)
+        done = sum(1 for job in submitted if job.state == 'done')
+        failed = sum(1 for job in submitted if job.state == 'failed')
+        running = sum(1 for job in submitted if job.state == 'running')
+        parts = [f"{len(self.jobs)} files", f"{done} done"]
+        if running:
+            parts.append(f"{running} running")
+        if failed:
+            parts.append(f"{failed} failed")
+        if waiting:
+            parts.append(f"{waiting} not started")
+        self.file_label.set_text(" • ".join(parts) if self.jobs else "No files queued (add files or drop them here)")
+        
+        if submitted:
+            self.progress_bar.set_fraction(sum(1.0 if job.finished else job.progress for job in submitted) / len(submitted))
+        if submitted and all(job.finished for job in submitted) and self._run_started is not None:
+            self.on_queue_finished(done, failed, len(submitted) - done - failed)
+        
+    def on_queue_finished(self, done, failed, cancelled):
+        audio_seconds = sum(job.result['metrics']['audio_seconds'] for job in self.jobs
+                            if job.state == 'done' and job.result is not None)
+        metrics = METRICS.summarize(self._run_started, audio_seconds)
+        self._run_started = None
+        logging.info('Queue metrics: %s', metrics)
+        # Report transcription completion information in the UI
+        summary = f"{done} transcribed"
+        if failed:
+            summary += f", {failed} failed"
+        if cancelled:
+            summary += f", {cancelled} cancelled"
+        summary += f" in {metrics['wall_seconds']:.1f}s"
+        if metrics['rtf'] is not None:
+            summary += f" • {metrics['rtf']:.2f}× real time"
+        if metrics['tokens_per_second'] is not None:
+            summary += f" • {metrics['tokens_per_second']:.0f} tokens/s"
+        self.update_status(f"{summary} • Peak memory: {metrics['peak_rss_mb']:.0f}MB")
+        self.transcribe_button.set_sensitive(any(job.model_name is None for job in self.jobs))
+        self.stop_button.set_sensitive(False)
+        
+    @staticmethod
+    def _friendly_error(error):
+        # Provide user-friendly error messages
+        error_msg = str(error)
+        user_msg = f"Error: {error_msg}" if error_msg else "Error during transcription"
+        if "out of memory" in error_msg.lower():
+            user_msg = "Out of memory. Try a smaller model or shorter audio file."
+        elif "file not found" in error_msg.lower() or "no such file" in error_msg.lower():
+            user_msg = "Audio file not found or inaccessible."
+        elif "unsupported format" in error_msg.lower():
+            user_msg = "Unsupported audio format. Try MP3, WAV, or M4A."
+        elif "cuda" in error_msg.lower():
+            user_msg = "GPU error. Try running on the CPU."
+        return user_msg
+        
+    def cleanup_resources(self):
+        """Clean up all resources used by the window"""
+        try:
+            # Cancel queued and running jobs, stop the scheduler threads and their worker pools
+            if hasattr(self, 'scheduler'):
+                self.scheduler.cancel_all()
+                self.scheduler.close()
+            
+            # Drop this window's reference; loaded models stay in the application's registry
+            if hasattr(self, 'models'):
+                self.models.cancel_warm_up()
+            if hasattr(self, 'whisper_model') and self.whisper_model is not None:
+                del self.whisper_model
+                self.whisper_model = None
+            
+            # Force garbage collection
+            gc.collect()
+            
+        except Exception as e:
+            print(f"Error during resource cleanup: {e}")
+    
+    def on_close_request(self, window):
+        """Handle window close request with proper cleanup"""
+        self.cleanup_resources()
+        return False  # Allow window to close
+    
+    def _job_export(self, job):
+        """Stream ``job``'s transcript to --output-dir in --formats (scheduler thread)"""
+        formats, unknown = parse_formats(APP_OPTIONS['formats'])
+        if unknown:
+            logging.warning('Ignoring unknown output formats: %s', ', '.join(unknown))
+        if not formats:
+            return None
+        target = self._output_names.target(Path(APP_OPTIONS['output_dir']) / Path(job.file_path).stem, job.file_path)
+        return TranscriptExport(target, formats)
+        
+    def _parallel_decoder(self, model_name):
+        """New worker pool for ``model_name``; the scheduler keeps it across that model's jobs"""
+        return ParallelChunkDecoder(model_name, APP_OPTIONS['workers'], APP_OPTIONS['quantize'])
+    
+    def _load_model_safely(self, model_name):
+        """Load Whisper model through the application's memory-budgeted model registry"""
+        try:
+            # Drop this window's reference so the registry alone decides what stays loaded
+            self.whisper_model = None
+            
+            # Load model with error handling
+            try:
+                model = self.models.get(model_name)
+                self.whisper_model = model
+                
+                return model
+                
+            except RuntimeError as e:
+                if "out of memory" in str(e).lower():
+                    # Try to recover from OOM by unloading every cached model and retrying once.
+                    # A smaller model is never substituted: the runner, transcript cache and
+                    # resume journal are all keyed by the requested model name.
+                    self.models.clear()
+                    GLib.idle_add(self.update_status, f"Memory issue, retrying {model_name} model...")
+                    model = self.models.get(model_name)
+                    self.whisper_model = model
+                    return model
+                else:
+                    raise e
+                    
+        except Exception as e:
+            error_msg = f"Failed to load model {model_name}: {str(e)}"
+            print(error_msg)
+            GLib.idle_add(self.update_status, error_msg)
+            raise e
+        
+    def update_transcription_text(self, text):
+        """Replace the whole transcription text (switching jobs); live updates use append"""
+        self.output_buffer.set_text(text, -1)
+        
+        # Auto-scroll to bottom to show latest text
+        self.output_textview.scroll_mark_onscreen(self.output_end_mark)
+    
+    def append_segment_items(self, segments, drafts=(), position=None, replaced=0):
+        """Append rows to the segment list, following the end if it was scrolled there.
+        With drafts shown, refined rows go in at ``position`` in place of the ``replaced`` draft
+        rows they cover, and new ``drafts`` rows are appended after the rest"""
+        adjustment = self.segment_scrolled.get_vadjustment()
+        at_end = adjustment.get_value() + adjustment.get_page_size() >= adjustment.get_upper() - 1
+        items = [SegmentItem(seg['start'], seg['end'], seg['text']) for seg in segments]
+        if position is None:
+            position = self.segment_store.get_n_items()
+        self.segment_store.splice(position, replaced, items)
+        if drafts:
+            self.segment_store.splice(self.segment_store.get_n_items(), 0,
+                                      [SegmentItem(seg['start'], seg['end'], seg['text'], draft=True) for seg in drafts])
+        if at_end:
+            GLib.idle_add(lambda: adjustment.set_value(adjustment.get_upper()) or False)
+    
+    def append_transcription_text(self, text):
+        """Append text at the end of the transcript"""
+        self.output_buffer.insert(self.output_buffer.get_end_iter(), text)
+        self.output_textview.scroll_mark_onscreen(self.output_end_mark)
+    
+    @staticmethod
+    def _draft_piece(segment):
+        return "\n\n" + _format_segment(segment['start'], segment['end'], segment['text'])
+    
+    def append_draft_text(self, segments, separate):
+        """Mark the end of the refined text and append draft segments after it, in italics"""
+        self.output_buffer.move_mark(self.output_draft_mark, self.output_buffer.get_end_iter())
+        if segments:
+            text = "".join(self._draft_piece(seg) for seg in segments)
+            self.output_buffer.insert_with_tags_by_name(self.output_buffer.get_end_iter(),
+                                                        text if separate else text[2:], "draft")
+            self.output_textview.scroll_mark_onscreen(self.output_end_mark)
+    
+    def refine_transcription_text(self, texts, covered, drafts):
+        """Insert refined segment texts in place of the ``covered`` drafts at the front of the
+        draft text, then append new ``drafts``"""
+        buffer = self.output_buffer
+        offset = buffer.get_iter_at_mark(self.output_draft_mark).get_offset()
+        if covered:
+            length = sum(len(self._draft_piece(seg)) for seg in covered)
+            buffer.delete(buffer.get_iter_at_offset(offset), buffer.get_iter_at_offset(offset + length))
+        if texts:
+            text = "\n\n" + "\n\n".join(texts)
+            buffer.insert(buffer.get_iter_at_offset(offset), text)
+            buffer.move_mark(self.output_draft_mark, buffer.get_iter_at_offset(offset + len(text)))
+        if drafts:
+            buffer.insert_with_tags_by_name(buffer.get_end_iter(), "".join(self._draft_piece(seg) for seg in drafts), "draft")
+        self.output_textview.scroll_mark_onscreen(self.output_end_mark)
+    
+    def update_progress(self, fraction, status):
+        self.progress_bar.set_fraction(fraction)
+        self.update_status(status)
+        
+    def update_status(self, message):
+        self.status_label.set_text(message)
+        
+
+def main():
+    _install_exception_hook()
+    logging.info('Starting Whisper Transcriber (debug=%s)', DEBUG_MODE)
+    app = WhisperTranscriber()
+    return app.run(None)
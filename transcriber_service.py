@@ -0,0 +1,275 @@
+"""Local transcription service (``--serve PORT``): models stay loaded between requests.
+
+Requests are TranscriptionJobs on one JobScheduler, so chunks of concurrent requests for the
+same model are decoded together in shared batches. Segments are streamed back as JSON lines
+while they are decoded; ``transcriber_client.py`` is a command-line client.
+
+    POST /transcribe?path=/abs/file.mp3[&model=small][&language=en][&task=translate][&draft=tiny]
+    POST /transcribe?filename=talk.mp3 with the audio file as the request body
+    GET  /health, GET /metrics
+"""
+import os
+import sys
+import json
+import queue
+import signal
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from transcriber_engine import (
+    APP_OPTIONS,
+    METRICS,
+    STARTUP,
+    JobScheduler,
+    ModelRegistry,
+    ParallelChunkDecoder,
+    TranscriptionJob,
+)
+
+_UPLOAD_BLOCK = 1024 * 1024
+
+
+def _remove(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class TranscriptionService:
+    """Owns the model registry and the scheduler, and hands each request's updates to its handler."""
+
+    def __init__(self):
+        self.models = ModelRegistry(APP_OPTIONS['model_memory_mb'] * 1024 * 1024, quantize=APP_OPTIONS['quantize'])
+        self._lock = threading.Lock()
+        self._listeners = {}  # job -> queue of changes
+        self._uploads = {}  # job -> temporary upload removed once the job has finished
+        self.scheduler = JobScheduler(
+            load_model=self.models.get,
+            concurrency=APP_OPTIONS['jobs'],
+            parallel_decoder=self._parallel_decoder,
+            on_update=self._on_update,
+            max_batch=max(APP_OPTIONS['batch_size'], APP_OPTIONS['jobs']),
+        )
+
+    def allowed_models(self) -> set:
+        import whisper
+        return set(whisper.available_models()) | {APP_OPTIONS['model'], APP_OPTIONS['draft_model']} - {None}
+
+    def _parallel_decoder(self, model_name):
+        # The scheduler keeps one pool per model while requests for that model run
+        return ParallelChunkDecoder(model_name, APP_OPTIONS['workers'], APP_OPTIONS['quantize'])
+
+    def _on_update(self, job, change):
+        with self._lock:
+            changes = self._listeners.get(job)
+            upload = self._uploads.pop(job, None) if job.finished else None
+        if changes is not None:
+            changes.put(change)
+        if upload is not None:
+            _remove(upload)
+
+    def remove_when_finished(self, job: TranscriptionJob, path: str):
+        """Delete ``path`` once ``job`` has finished; a job cancelled by a disconnect may still be reading it."""
+        with self._lock:
+            if not job.finished:
+                self._uploads[job] = path
+                return
+        _remove(path)
+
+    def submit(self, job: TranscriptionJob) -> queue.Queue:
+        """Queue ``job``; its changes ('state', 'status', 'progress', 'segments', 'draft') arrive on the returned queue."""
+        changes = queue.Queue()
+        with self._lock:
+            self._listeners[job] = changes
+        self.scheduler.submit(job)
+        return changes
+
+    def forget(self, job: TranscriptionJob):
+        with self._lock:
+            self._listeners.pop(job, None)
+
+    def close(self):
+        self.scheduler.cancel_all()
+        self.scheduler.close()
+        with self._lock:
+            uploads, self._uploads = list(self._uploads.values()), {}
+        for path in uploads:
+            _remove(path)
+        logging.info('Model cache: %s', self.models.summary())
+        self.models.clear()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: TranscriptionService = None
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/health':
+            self._send_json(200, {'models': self.service.models.summary(), 'busy': self.service.scheduler.busy(),
+                                  'max_upload_mb': APP_OPTIONS['max_upload_mb']})
+        elif path == '/metrics':
+            body = METRICS.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/transcribe':
+            self._send_json(404, {'error': 'not found'})
+            return
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        model_name = params.get('model') or APP_OPTIONS['model']
+        if model_name not in self.service.allowed_models():
+            self._send_json(400, {'error': f'unknown model: {model_name}'})
+            return
+        draft_model = params.get('draft') or APP_OPTIONS['draft_model']
+        if draft_model and draft_model not in self.service.allowed_models():
+            self._send_json(400, {'error': f'unknown draft model: {draft_model}'})
+            return
+        task = params.get('task', 'transcribe')
+        if task not in ('transcribe', 'translate'):
+            self._send_json(400, {'error': f'unknown task: {task}'})
+            return
+
+        upload = None
+        if 'path' in params:
+            file_path = params['path']
+            if not os.path.isfile(file_path):
+                self._send_json(400, {'error': f'no such file: {file_path}'})
+                return
+        else:
+            try:
+                length = int(self.headers.get('Content-Length', ''))
+            except ValueError:
+                self._send_json(411, {'error': 'an upload needs a Content-Length'})
+                return
+            limit = APP_OPTIONS['max_upload_mb'] * 1024 * 1024
+            if not 0 < length <= limit:
+                # The body is never read, so the connection is closed after the reply
+                self.close_connection = True
+                self._send_json(413 if length > limit else 400,
+                                {'error': f"uploads must be 1 byte to {APP_OPTIONS['max_upload_mb']} MB"})
+                return
+            upload = self._receive(length, Path(params.get('filename', '')).suffix)
+            if upload is None:
+                return
+            file_path = upload
+        job = TranscriptionJob(file_path, model_name, language=params.get('language') or APP_OPTIONS['language'],
+                               task=task, draft_model=draft_model)
+        try:
+            self._stream(job)
+        finally:
+            if upload is not None:
+                self.service.remove_when_finished(job, upload)
+
+    def _receive(self, length: int, suffix: str):
+        """Copy the request body to a temporary file; None when the client went away."""
+        fd, path = tempfile.mkstemp(prefix='whisper-upload-', suffix=suffix)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while length > 0:
+                    block = self.rfile.read(min(length, _UPLOAD_BLOCK))
+                    if not block:
+                        raise ConnectionError('upload ended early')
+                    f.write(block)
+                    length -= len(block)
+        except (OSError, ConnectionError) as e:
+            logging.info('Upload failed: %s', e)
+            _remove(path)
+            return None
+        return path
+
+    def _stream(self, job: TranscriptionJob):
+        """Send the job's segments as JSON lines while it runs; the connection closes after the final line."""
+        changes = self.service.submit(job)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        sent = drafted = 0
+        try:
+            while True:
+                change = changes.get()
+                if change == 'segments' and len(job.segments) > sent:
+                    self._write_line({'segments': job.segments[sent:]})
+                    sent = len(job.segments)
+                elif change == 'draft' and len(job.draft_segments) > drafted:
+                    self._write_line({'draft': job.draft_segments[drafted:]})
+                    drafted = len(job.draft_segments)
+                elif change == 'status':
+                    self._write_line({'status': job.status})
+                if not job.finished:
+                    continue
+                if len(job.segments) > sent:
+                    self._write_line({'segments': job.segments[sent:]})
+                final = {'state': job.state, 'elapsed': job.elapsed}
+                if job.result is not None:
+                    final.update(language=job.result['language'], metrics=job.result['metrics'])
+                if job.error is not None:
+                    final['error'] = str(job.error)
+                self._write_line(final)
+                break
+        except OSError:
+            # The client disconnected; stop decoding its chunks
+            logging.info('Client went away, cancelling %s', job.file_path)
+            job.cancel()
+        finally:
+            self.service.forget(job)
+
+    def _write_line(self, payload: dict):
+        self.wfile.write(json.dumps(payload, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        logging.info('service: ' + format, *args)
+
+
+def serve(port: int) -> int:
+    """Serve transcriptions on http://127.0.0.1:PORT until interrupted; returns the exit code."""
+    import warnings
+    warnings.filterwarnings("ignore", message="FP16 is not supported on CPU; using FP32 instead")
+    warnings.filterwarnings("ignore", message="The given NumPy array is not writable")
+
+    service = TranscriptionService()
+    print(f"Loading {APP_OPTIONS['model']} model...", file=sys.stderr)
+    service.models.get(APP_OPTIONS['model'])
+    STARTUP.mark('model loaded')
+    METRICS.start()
+
+    handler = type('Handler', (_Handler,), {'service': service})
+    try:
+        server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    except OSError as e:
+        print(f"Cannot listen on port {port}: {e}", file=sys.stderr)
+        service.close()
+        return 1
+    server.daemon_threads = True
+    # SIGTERM stops the service like Ctrl+C does
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+    print(f"Serving transcriptions on http://127.0.0.1:{server.server_address[1]}/transcribe", file=sys.stderr, flush=True)
+    STARTUP.report('Service startup')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
@@ -134,6 +134,12 @@ hiddenimports = [
     'psutil',
     'tqdm',
     'numba',
+    # GUI, batch CLI and service modules are imported lazily by the entry point
+    'transcriber_engine',
+    'transcriber_gui',
+    'transcriber_cli',
+    'transcriber_export',
+    'transcriber_service',
     # do not include pkg_resources.py2_warn; not present in modern setuptools
 ]
 